@@ -0,0 +1,32 @@
+""" Time the parsing of generated stylesheets
+
+Run with `python -m benchmarks.bench_parse`
+"""
+import os
+import tempfile
+import time
+
+from lib.css import parse_css_file
+
+from .generate import generate_stylesheet
+
+SIZES = [(100, 10), (1000, 100), (2000, 1000)]
+
+
+def bench_parse(rules, keyframes, repeat=3):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "style.css")
+        with open(filename, "w") as f:
+            f.write(generate_stylesheet(rules, keyframes))
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse_css_file(filename)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    for rules, keyframes in SIZES:
+        print("{} rules, {} keyframes: {:.3f}s".format(rules, keyframes, bench_parse(rules, keyframes)))
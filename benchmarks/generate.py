@@ -0,0 +1,35 @@
+""" Generators of synthetic shows for the benchmarks """
+
+# each rule starts its animation this many seconds after the previous one
+DELAY_STEP = 0.01
+
+
+def last_delay(rules):
+    """ Return the time at which the animations of all the rules of generate_stylesheet are running """
+    return (rules - 1) * DELAY_STEP if rules else 0
+
+
+def generate_stylesheet(rules=1000, keyframes=100, stops=11):
+    """ Return a stylesheet with `rules` id rules animated with `keyframes` @keyframes of `stops` stops """
+    css = []
+    for i in range(rules):
+        css.append("#p{} {{ color: rgb({}, {}, {}); animation: k{} 2s ease {}ms infinite alternate; }}".format(
+            i, i % 256, (i * 7) % 256, (i * 13) % 256, i % keyframes, round(i * DELAY_STEP * 1000)))
+    for k in range(keyframes):
+        frames = " ".join("{}% {{ color: rgb({}, 0, 0); strobe: {}; }}".format(
+            round(s * 100 / (stops - 1)), s * 255 // (stops - 1), s / (stops - 1)) for s in range(stops))
+        css.append("@keyframes k{} {{ {} }}".format(k, frames))
+    return "\n".join(css)
+
+
+def generate_tree(pixels=1000, device="led-ws2811", channels=3):
+    """ Return a tree of `pixels` devices with ids p0, p1..., filling as many universes as needed """
+    per_universe = 512 // channels
+    tree = ["<root>"]
+    for u in range(0, pixels, per_universe):
+        tree.append("<node universe='{}'>".format(u // per_universe + 1))
+        for i in range(u, min(u + per_universe, pixels)):
+            tree.append("<{} id='p{}' address='{}' />".format(device, i, 1 + channels * (i - u)))
+        tree.append("</node>")
+    tree.append("</root>")
+    return "\n".join(tree)
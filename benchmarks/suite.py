@@ -0,0 +1,186 @@
+""" Time each stage of generated shows, from parsing to the cost of a frame
+
+Run with `python -m benchmarks.suite`, see --help for the sizes. Results are stored as JSON in
+benchmarks/results/<version>.json, use --compare with the results of another version to see
+the ratio of each measure.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+from lib import __version__, vectorized
+from lib.core import apply_style_on_dom, compute_dmx
+from lib.css import parse_css_file
+from lib.hardware import load_devices
+from lib.output import Mailbox
+from lib.plan import DMX_CHANNELS, compile_plan
+from lib.tree import parse_tree_file
+
+from .generate import generate_stylesheet, generate_tree, last_delay
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# (pixels, rules, keyframes)
+SIZES = [(100, 100, 10), (1000, 1000, 100), (5000, 5000, 100)]
+
+FPS = 50
+
+
+def measure(function, repeat=3):
+    """ Time function, then run it again to trace the memory it allocates
+        Return the best time in seconds, the peak of memory allocated in bytes and the result of the last call
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def measure_frames(compute, frames, start=0):
+    """ Call compute(t) for `frames` consecutive frames from the show time start
+        Return the mean and the max time of a frame in seconds, and the peak of memory allocated by a frame
+    """
+    times = []
+    for i in range(frames):
+        begin = time.perf_counter()
+        compute(start + i / FPS)
+        times.append(time.perf_counter() - begin)
+    tracemalloc.start()
+    peak = 0
+    for i in range(min(frames, 10)):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        compute(start + i / FPS)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return sum(times) / len(times), max(times), peak
+
+
+def encode(state):
+    """ Write the (address, value) pairs of compute_dmx into a frame per universe """
+    frames = {}
+    for universe, values in state.items():
+        frame = frames[universe] = bytearray(DMX_CHANNELS)
+        for address, value in values:
+            frame[address - 1] = value
+    return frames
+
+
+def bench_show(pixels, rules, keyframes, frames=100, reference_frames=10):
+    """ Benchmark a generated show and return the results as a dict() """
+    devices = load_devices()
+    stages = {}
+    with tempfile.TemporaryDirectory() as directory:
+        tree_file = os.path.join(directory, "tree.xml")
+        css_file = os.path.join(directory, "style.css")
+        with open(tree_file, "w") as f:
+            f.write(generate_tree(pixels))
+        with open(css_file, "w") as f:
+            f.write(generate_stylesheet(rules, keyframes))
+        stages['parse_tree_file'], memory, tree = measure(lambda: parse_tree_file(tree_file))
+        stages['parse_tree_file'] = {'seconds': stages['parse_tree_file'], 'memory': memory}
+        seconds, memory, css = measure(lambda: parse_css_file(css_file))
+        stages['parse_css_file'] = {'seconds': seconds, 'memory': memory}
+    seconds, memory, _ = measure(lambda: apply_style_on_dom(tree, css), repeat=1)
+    stages['apply_style_on_dom'] = {'seconds': seconds, 'memory': memory}
+    backends = [('plan', False)] + ([('plan numpy', True)] if vectorized.available() else [])
+    plans = {}
+    for name, vectorize in backends:
+        seconds, memory, plans[name] = measure(lambda: compile_plan(tree, devices, css.keyframes, vectorize=vectorize))
+        stages['compile ' + name] = {'seconds': seconds, 'memory': memory}
+
+    computes = [('compute_dmx', lambda t: encode(compute_dmx(tree, devices, css.keyframes, t)), reference_frames)]
+    computes += [(name, plan.compute, frames) for name, plan in plans.items()]
+    mailbox = Mailbox()
+    sample = {universe: bytearray(frame) for universe, frame in plans['plan'].compute(0).items()}
+
+    def encode_frame(t):
+        # identical frames are not published (see Mailbox.put)
+        for frame in sample.values():
+            frame[0] = (frame[0] + 1) % 256
+        mailbox.put(sample)
+
+    computes.append(('encode', encode_frame, frames))
+    # measure once every pixel is animated, pixels still waiting for their delay cost less
+    start = last_delay(rules)
+    results = {}
+    for name, compute, count in computes:
+        mean, worst, memory = measure_frames(compute, count, start)
+        results[name] = {'mean': mean, 'max': worst, 'fps': 1 / mean if mean else 0, 'memory': memory}
+    return {'pixels': pixels, 'rules': rules, 'keyframes': keyframes, 'start': start, 'universes': len(sample),
+            'stages': stages, 'frames': results}
+
+
+def format_memory(size):
+    return "{:.1f}MB".format(size / 2 ** 20) if size >= 2 ** 20 else "{:.1f}kB".format(size / 2 ** 10)
+
+
+def print_result(result, previous=None):
+    print("{pixels} pixels ({universes} universes), {rules} rules, {keyframes} keyframes, "
+          "frames from {start:.2f}s".format(**result))
+
+    def ratio(section, name, key):
+        try:
+            old = previous[section][name][key]
+        except (TypeError, KeyError):
+            return ""
+        return " ({:.2f}x)".format(result[section][name][key] / old) if old else ""
+
+    for name, stage in result['stages'].items():
+        print("  {:<20} {:>9.2f}ms{:<9} {:>9}".format(name, stage['seconds'] * 1e3, ratio('stages', name, 'seconds'),
+                                                    format_memory(stage['memory'])))
+    for name, frame in result['frames'].items():
+        print("  {:<20} {:>9.3f}ms{:<9} max {:.3f}ms {:>9.0f} fps {:>9} per frame".format(
+            "frame " + name, frame['mean'] * 1e3, ratio('frames', name, 'mean'), frame['max'] * 1e3, frame['fps'],
+            format_memory(frame['memory'])))
+
+
+def size(value):
+    try:
+        pixels, rules, keyframes = [int(v) for v in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected PIXELS,RULES,KEYFRAMES, got {}".format(value))
+    return pixels, rules, keyframes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the stages of generated shows")
+    parser.add_argument("--size", type=size, action='append', metavar="PIXELS,RULES,KEYFRAMES",
+                        help="size of a generated show, can be repeated (default: {})".format(
+                            " ".join(",".join(str(v) for v in s) for s in SIZES)))
+    parser.add_argument("--frames", type=int, default=100, help="frames computed by the plans (default: 100)")
+    parser.add_argument("--reference-frames", type=int, default=10,
+                        help="frames computed by compute_dmx, which is much slower (default: 10)")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "{}.json".format(__version__)),
+                        help="file to store the results in (default: benchmarks/results/<version>.json)")
+    parser.add_argument("--compare", metavar="FILE", help="results of another version to compare with")
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {(r['pixels'], r['rules'], r['keyframes']): r for r in json.load(f)['results']}
+    results = []
+    for pixels, rules, keyframes in args.size or SIZES:
+        result = bench_show(pixels, rules, keyframes, args.frames, args.reference_frames)
+        print_result(result, previous.get((pixels, rules, keyframes)))
+        results.append(result)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({'version': __version__, 'date': datetime.now().isoformat(timespec='seconds'),
+                   'python': platform.python_version(), 'machine': platform.machine(),
+                   'processor': platform.processor(), 'numpy': vectorized.available(),
+                   'results': results}, f, indent=2)
+    print("results stored in {}".format(args.output))
@@ -1,92 +1,172 @@
-from datetime import datetime
-from functools import lru_cache
-import serial
-from time import sleep
-import array
-
-import ola.ClientWrapper
-
-from lib.core import apply_style_on_dom, compute_dmx
-from lib.hardware import load_devices
-from lib.tree import parse_tree_file
-from lib.css import parse_css_file
-from lib.utils import trange
-
-
-@lru_cache(maxsize=1)
-def get_ola_client():
-    try:
-        return ola.ClientWrapper.OlaClient()
-    except Exception as e:
-        print(e)
-        return None
-
-
-@lru_cache(maxsize=1)
-def get_serial():
+import argparse
+import os
+from time import monotonic, perf_counter_ns
+
+from lib import stats
+from lib import dmxserial
+from lib.dmxserial import DmxSerial
+from lib.network import ARTNET_BROADCAST, SACN, ArtNet
+from lib.output import KEEPALIVE, OLA, Mailbox, load_outputs, start_outputs
+from lib.parallel import ParallelPlan
+from lib.recording import Player, Recording, render
+from lib.reload import ShowWatcher
+from lib.scheduler import FrameScheduler, POLICIES
+from lib.show import load_show
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "css2dmx")
+
+
+def run(plan, verbose=False, *, fps=50, policy='skip', spin=0.001, report=0, keepalive=KEEPALIVE,
+        senders=None, watcher=None):
+    """ Play plan, sending its frames to each (name, backend) or (name, backend, options) of senders
+        (see lib.output.start_outputs, default: OLA and the serial port)
+    """
+    if watcher is not None:
+        watcher.plan = plan
+        watcher.start()
+    # each output runs on its own thread so that a slow device never delays the next frame
+    mailbox = Mailbox()
+    if senders is None:
+        senders = [('ola', OLA()), ('serial', DmxSerial())]
+    outputs = start_outputs(mailbox, senders, keepalive)
+    scheduler = FrameScheduler(fps, spin=spin, policy=policy)
+    stats.gauge('scheduler', scheduler.stats.to_dict)
+    next_report = monotonic() + report
     try:
-        return serial.Serial("/dev/ttyACM0", 115200, timeout=.1)
-    except serial.serialutil.SerialException as e:
-        print(e)
-        return None
-
-
-@lru_cache()
-def create_bytes(state):
-    state = dict(state)
-    bs = []
-    for i in range(1, 512):
-        bs.append(state.get(i, 0))
-    bs = bytes(bs)
-    return bs
-
-
-def send_ola(state):
-    client = get_ola_client()
-    if client:
-        bs = create_bytes(state)
-        client.SendDmx(universe=1, data=array.array('B', bs))
-
-
-def send_serial(state):
-    ser = get_serial()
-    if ser:
-        bs = b"\x00" + create_bytes(state)
-        for i in range(8):
-            chunk = bs[i * 16:(i + 1) * 16]
-            ser.write(chunk)
-            sleep(1e-4)
-
-
-def send_dmx(state):
-    state = tuple(state)
-    send_ola(state)
-    send_serial(state)
-
-
-def run(devices, tree, css, verbose=False):
-    apply_style_on_dom(tree, css)
-    tree.print()
-    keyframes = css.keyframes
-    now = datetime.now()
-    for t in trange(interval=0.02):
-        state = compute_dmx(tree, devices, keyframes, t.timestamp() - now.timestamp())
-        if verbose:
-            print(state)
-        send_dmx(state)
+        for t in scheduler:
+            # swap the show between two frames, the show time keeps going
+            if watcher is not None:
+                plan = watcher.take() or plan
+            start = perf_counter_ns()
+            frames = plan.compute(t)
+            computed = perf_counter_ns()
+            if verbose:
+                for universe, frame in frames.items():
+                    print(universe, [(i + 1, v) for i, v in enumerate(frame) if v])
+            encoding = perf_counter_ns()
+            waited = mailbox.put(frames)
+            stats.record('compute', computed - start)
+            stats.record('encode', perf_counter_ns() - encoding - waited)
+            if waited:
+                # outputs with the block policy hold the next frame back
+                stats.record('backpressure', waited)
+            stats.count('frames')
+            if report and monotonic() >= next_report:
+                print(scheduler.stats)
+                print(stats.summary())
+                scheduler.stats.reset()
+                stats.reset()
+                next_report += report
+    finally:
+        mailbox.close()
+        # the outputs close their backend
+        for output in outputs:
+            output.join(1)
+        if watcher is not None:
+            watcher.stop()
 
 if __name__ == '__main__':
-    import sys
-    import os
-    dir_path = sys.argv[1]
-    dir_name = os.path.basename(dir_path)
-    tree_file = os.path.join(dir_path, "tree.xml")
-    css_file = os.path.join(dir_path, "style.css")
-
-    verbose = len(sys.argv) == 3 and sys.argv[2] == "-v"
-
-    devices = load_devices()
-    tree = parse_tree_file(tree_file)
-    css = parse_css_file(css_file)
-
-    run(devices, tree, css, verbose)
+    parser = argparse.ArgumentParser(description="Control DMX512 devices with CSS stylesheets")
+    parser.add_argument("project", nargs='?', help="directory containing tree.xml and style.css")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every frame")
+    parser.add_argument("--fps", type=float, default=50, help="frame rate (default: 50)")
+    parser.add_argument("--late", choices=POLICIES, default='skip',
+                        help="what to do with the frames missed when late (default: skip)")
+    parser.add_argument("--spin", type=float, default=0.001, metavar="SECONDS",
+                        help="busy wait the last SECONDS before each frame for a steadier frame rate, "
+                             "0 saves CPU on low-power controllers (default: 0.001)")
+    parser.add_argument("--report", type=float, default=0, metavar="SECONDS",
+                        help="print frame timing statistics and the timing of each stage every SECONDS")
+    parser.add_argument("--stats-port", type=int, metavar="PORT",
+                        help="serve performance counters as JSON on http://127.0.0.1:PORT/stats, the timings are "
+                             "reset every --report SECONDS when given")
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE, metavar="SECONDS",
+                        help="send the universes that did not change again every SECONDS, 0 only sends "
+                             "changes (default: {})".format(KEEPALIVE))
+    parser.add_argument("--outputs", metavar="FILE",
+                        help="outputs of the show, with their refresh rate (default: outputs.json in the project "
+                             "when it exists, otherwise OLA, the serial port and --artnet/--sacn)")
+    parser.add_argument("--serial-port", default=dmxserial.PORT, metavar="PORT",
+                        help="serial port of the DMX interface (default: {})".format(dmxserial.PORT))
+    parser.add_argument("--baudrate", type=int, default=dmxserial.BAUDRATE,
+                        help="baud rate of the serial port (default: {})".format(dmxserial.BAUDRATE))
+    parser.add_argument("--serial-delta", action="store_true",
+                        help="only send the changed channels to the serial port, in packets of label 0x80 "
+                             "that require a custom firmware (not supported by an Enttec DMX USB Pro)")
+    parser.add_argument("--serial-chunk", type=int, metavar="BYTES",
+                        help="write the serial port in chunks of at most BYTES (default: one write per frame)")
+    parser.add_argument("--artnet", nargs='?', const=ARTNET_BROADCAST, metavar="HOST",
+                        help="also send the universes with Art-Net to HOST (default: broadcast)")
+    parser.add_argument("--sacn", nargs='?', const='', metavar="HOST",
+                        help="also send the universes with sACN (E1.31) to HOST "
+                             "(default: the multicast group of each universe)")
+    parser.add_argument("-w", "--watch", action="store_true",
+                        help="reload tree.xml and style.css when they change, without stopping the output")
+    parser.add_argument("--workers", type=int, default=0, metavar="N",
+                        help="compute the universes in N worker processes (default: in the main process)")
+    parser.add_argument("--devices", action='append', metavar="DIR",
+                        help="directory of device profiles, can be repeated, the first one providing "
+                             "a device wins (default: the devices directory of css2dmx)")
+    parser.add_argument("--cache", nargs='?', const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help="store the compiled show in DIR and load it from there when the project "
+                             "did not change (default: {})".format(DEFAULT_CACHE_DIR))
+    parser.add_argument("--render", metavar="FILE",
+                        help="compute the show as fast as possible into a recording FILE instead of playing it")
+    parser.add_argument("--duration", type=float, metavar="SECONDS", help="duration of the recording")
+    parser.add_argument("--start", type=float, default=0, metavar="SECONDS",
+                        help="show time of the first recorded frame with --render, "
+                             "cue to start from with --play (default: 0)")
+    parser.add_argument("--compress", action="store_true", help="compress the recording")
+    parser.add_argument("--play", metavar="FILE", help="play a recording made with --render instead of a project")
+    parser.add_argument("--speed", type=float, default=1,
+                        help="playback speed of --play, negative to play backwards (default: 1)")
+    parser.add_argument("--loop", action="store_true", help="loop the recording played with --play")
+    args = parser.parse_args()
+
+    outputs_file = args.outputs
+    if outputs_file is None and args.project is not None and os.path.exists(os.path.join(args.project, "outputs.json")):
+        outputs_file = os.path.join(args.project, "outputs.json")
+    if outputs_file is not None:
+        senders = load_outputs(outputs_file)
+    else:
+        serial = DmxSerial(args.serial_port, args.baudrate, chunk_size=args.serial_chunk, delta=args.serial_delta)
+        senders = [('ola', OLA()), ('serial', serial)]
+        if args.artnet is not None:
+            senders.append(('artnet', ArtNet(args.artnet)))
+        if args.sacn is not None:
+            senders.append(('sacn', SACN(args.sacn or None)))
+    if args.play:
+        if args.stats_port:
+            stats.serve(args.stats_port)
+        with Recording(args.play) as recording:
+            player = Player(recording, start=args.start, speed=args.speed, loop=args.loop)
+            run(player, args.verbose, fps=recording.fps, policy=args.late, spin=args.spin, report=args.report,
+                keepalive=args.keepalive, senders=senders)
+    elif args.project is None:
+        parser.error("the project is required unless --play is given")
+    elif args.render and args.duration is None:
+        parser.error("--render requires --duration")
+    elif args.workers and args.watch:
+        parser.error("--workers cannot be combined with --watch")
+    else:
+        tree_file = os.path.join(args.project, "tree.xml")
+        css_file = os.path.join(args.project, "style.css")
+
+        show = load_show(tree_file, css_file, args.cache, args.devices)
+        # workers are started before any other thread, as they are forked
+        plan = ParallelPlan(show.plan, args.workers) if args.workers else show.plan
+        if args.stats_port:
+            stats.serve(args.stats_port)
+        try:
+            if args.render:
+                count = render(plan, args.render, args.duration, args.fps, start=args.start,
+                               compress=args.compress)
+                print("rendered {} frames to {}".format(count, args.render))
+            else:
+                show.tree.print()
+                watcher = ShowWatcher(tree_file, css_file, show.devices, show.tree, show.css) if args.watch else None
+                run(plan, args.verbose, fps=args.fps, policy=args.late, spin=args.spin, report=args.report,
+                    keepalive=args.keepalive, senders=senders, watcher=watcher)
+        finally:
+            if args.workers:
+                plan.close()
@@ -0,0 +1,85 @@
+""" Interface of the output backends (see lib.output.BACKENDS)
+
+An Output thread drives one backend: it opens it before each frame, writes the universes that
+changed, flushes it, and closes it when the show stops. health() is served with the
+performance counters (see lib.stats).
+"""
+from logging import getLogger
+from time import monotonic
+
+logger = getLogger(__name__)
+
+# seconds between two attempts to connect
+RETRY = 1.0
+
+
+class Backend:
+    """ A device or a protocol receiving universes
+
+        Subclasses implement connect() and write(universe, frame), and call close() when the
+        connection is lost: open() connects again at most once every `retry` seconds, frames
+        are dropped in the meantime. Only the first failure of a series is logged as a warning,
+        errors counts all of them (see health()). A backend can be used as the send(universe, frame) of an Output.
+    """
+    retry = RETRY
+
+    def __init__(self):
+        self.connected = False
+        self.next_attempt = 0
+        self.errors = 0
+        # whether the last attempt to connect failed
+        self.failing = False
+
+    def connect(self):
+        """ Connect to the device, raise an exception on failure """
+
+    def open(self):
+        """ Connect unless connected or the last attempt is too recent, return whether it is connected """
+        if self.connected:
+            return True
+        now = monotonic()
+        if now < self.next_attempt:
+            return False
+        self.next_attempt = now + self.retry
+        try:
+            self.connect()
+        except Exception as e:
+            self.errors += 1
+            log = logger.debug if self.failing else logger.warning
+            log("cannot connect {}: {}".format(self, e))
+            self.failing = True
+            return False
+        if self.failing:
+            logger.info("connected {} after {} errors".format(self, self.errors))
+        self.failing = False
+        self.connected = True
+        return True
+
+    def write(self, universe, frame):
+        raise NotImplementedError
+
+    def flush(self):
+        """ Called once all the universes of a frame have been written """
+
+    def close(self):
+        self.connected = False
+
+    def health(self):
+        return {'connected': self.connected, 'errors': self.errors}
+
+    def __call__(self, universe, frame):
+        if self.open():
+            self.write(universe, frame)
+
+    def __str__(self):
+        return type(self).__name__
+
+
+class Callback(Backend):
+    """ A backend calling send(universe, frame) """
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+
+    def write(self, universe, frame):
+        self.send(universe, frame)
@@ -1,4 +1,7 @@
-from .utils import compute_cubic_bezier, de_casteljau
+from bisect import bisect_right
+from copy import copy
+
+from .utils import compute_easing
 from .css import get_timing_function_coefs
 
 
@@ -79,15 +82,17 @@ COMPUTING_FUNCTIONS = {
 
 
 def compute_dmx(tree, devices, keyframes, t):
-    dmx = []
+    """ Return the (address, value) pairs of each universe, sorted by address """
+    dmx = {}
     for node in tree.walk():
         if node.tag in devices:
+            universe = dmx.setdefault(node.universe, [])
             style = compute_style(node, keyframes, t)
             for prop, attrs in style.items():
                 if prop in devices[node.tag] and prop in COMPUTING_FUNCTIONS:
                     dmx_val = COMPUTING_FUNCTIONS[prop](attrs, devices[node.tag], node.address)
-                    dmx.extend(dmx_val)
-    return sorted(dmx, key=lambda x: x[0])
+                    universe.extend(dmx_val)
+    return {universe: sorted(values, key=lambda x: x[0]) for universe, values in dmx.items()}
 
 
 # ANIMATIONS
@@ -110,49 +115,98 @@ def animation_is_on(anim, t):
     return anim.iteration == 'infinite' or t <= anim.duration * anim.iteration
 
 
-def select_keyframe(frames, t):
-    for f in frames:
-        if f.selector / 100 > t:
-            higher = f
-            break
-        lower = f
-    return lower, higher
-
-
-def compute_function_at(function, lower_frame, higher_frame, t):
-    lower_selector, higher_selector = lower_frame.selector / 100, higher_frame.selector / 100
+class Timeline:
+    """ Keyframes compiled into the segments between consecutive frames
+
+        Each segment holds the (property, lower value, higher value) declared by both of its
+        frames, matched once instead of on every frame. Segments are found by binary search
+        on the sorted frame selectors, the last segment found is remembered since consecutive
+        frames of an animation usually fall in the same segment or the next one.
+        Timelines made with copy() share their segments but not the last segment.
+    """
+    def __init__(self, keyframe):
+        self.current = 0
+        frames = keyframe.frames
+        self.selectors = [f.selector / 100 for f in frames]
+        self.segments = []
+        for lower, higher in zip(frames, frames[1:]):
+            higher_values = {d.property: d.value for d in higher.declarations}
+            self.segments.append([(d.property, d.value, higher_values[d.property])
+                                  for d in lower.declarations if d.property in higher_values])
+
+    def copy(self):
+        timeline = copy(self)
+        timeline.current = 0
+        return timeline
+
+    def find(self, t):
+        """ Return the index of the segment containing t, or -1 when t is outside of the keyframes """
+        selectors = self.selectors
+        i = self.current
+        if i + 1 < len(selectors) and selectors[i] <= t < selectors[i + 1]:
+            return i
+        if i + 2 < len(selectors) and selectors[i + 1] <= t < selectors[i + 2]:
+            self.current = i + 1
+            return i + 1
+        # the lower frame is the last frame at or before t, the higher frame is the next one
+        i = bisect_right(selectors, t) - 1
+        if i < 0 or i + 1 >= len(selectors):
+            return -1
+        self.current = i
+        return i
+
+
+def compute_function_at(function, lower_selector, higher_selector, t):
     x0 = (t - lower_selector) / (higher_selector - lower_selector)
     p1, p2 = get_timing_function_coefs(function)
-    coefs = (0, 0), p1, p2, (1, 1)
-    x = compute_cubic_bezier(p1[0], p2[0], x0)[-1]
-    ratio = de_casteljau(x, coefs)[1]
-    return ratio
+    return compute_easing(p1, p2, x0)
+
+
+def compute_animation(anim, timeline, t, style=None, values=None):
+    """ Return the style of an animation at time t, timeline holds its compiled keyframes
+        When style is given, it is cleared and filled instead of a new dict. When values is given,
+        the animated values are interpolated into the values it holds by property, which are
+        created the first time, instead of new values (see Value.interpolate_into)
+    """
+    if style is None:
+        style = {}
+    else:
+        style.clear()
+    # if positive delay, we don't start yet
+    if t < anim.delay:
+        return style
+    # when delay is positive, we want to play the animation as if we are in the past
+    # when delay is negative, we want to play the animation as if it had already begun
+    anim_t = t - anim.delay
+    anim_reversed = animation_is_reversed(anim, anim_t)
+    if anim_reversed:
+        anim_t = anim.duration - (anim_t % anim.duration)
+    if not animation_is_on(anim, anim_t):
+        return style
+    # compute where we are in the animation
+    percent_t = (anim_t % anim.duration) / anim.duration
+    # select the segment we're in
+    i = timeline.find(percent_t)
+    if i < 0:
+        return style
+    # compute the bezier
+    ratio = compute_function_at(anim.function, timeline.selectors[i], timeline.selectors[i + 1], percent_t)
+    # apply each property declared by both frames
+    for prop, low, high in timeline.segments[i]:
+        if values is None:
+            style[prop] = low.interpolate(high, ratio)
+            continue
+        dest = values.get(prop)
+        if dest is None:
+            dest = values[prop] = low.copy()
+        style[prop] = low.interpolate_into(high, ratio, dest)
+    return style
 
 
 def compute_animations(animations, keyframes, t):
     style = {}
     for name, anim in animations.items():
-        # if positive delay, we don't start yet
-        if t < anim.delay:
-            continue
-        # when delay is positive, we want to play the animation as if we are in the past
-        # when delay is negative, we want to play the animation as if it had already begun
-        anim_t = t - anim.delay
-        anim_reversed = animation_is_reversed(anim, anim_t)
-        if anim_reversed:
-            anim_t = anim.duration - (anim_t % anim.duration)
-        if animation_is_on(anim, anim_t):
-            # compute where we are in the animation
-            percent_t = (anim_t % anim.duration) / anim.duration
-            # select the frame we're in
-            lower_frame, higher_frame = select_keyframe(keyframes[name].frames, percent_t)
-            # compute the bezier
-            ratio = compute_function_at(anim.function, lower_frame, higher_frame, percent_t)
-            # apply each property
-            for low_prop in lower_frame.declarations:
-                for high_prop in higher_frame.declarations:
-                    if low_prop.property == high_prop.property:
-                        style[low_prop.property] = low_prop.value.interpolate(high_prop.value, ratio)
+        style.update(compute_animation(anim, Timeline(keyframes[name]), t))
     return style
 
 
@@ -2,7 +2,6 @@ from collections import namedtuple
 import re
 from abc import ABC, abstractmethod
 
-import cssutils
 import tinycss2
 
 
@@ -96,21 +95,41 @@ def parse_direction(direction):
 
 
 class Value(ABC):
+    """ Base of the property values, stored in __slots__ so that animated values can be
+        interpolated into preallocated values instead of allocating new ones on every frame
+    """
+    __slots__ = ()
+
     @abstractmethod
-    def interpolate(self, other, ratio):
+    def interpolate_into(self, other, ratio, dest):
+        """ Write the interpolation between self and other into dest and return dest """
         pass
 
+    def interpolate(self, other, ratio):
+        return self.interpolate_into(other, ratio, self.copy())
+
+    def copy(self):
+        return self.copy_into(object.__new__(self.__class__))
+
+    def copy_into(self, dest):
+        for name in self.__slots__:
+            setattr(dest, name, getattr(self, name))
+        return dest
+
     def __repr__(self):
         name = self.__class__.__name__
-        attributes = ", ".join(["{}={}".format(n, v) for n, v in self.__dict__.items()])
+        attributes = ", ".join(["{}={}".format(n, getattr(self, n)) for n in self.__slots__])
         return "{}({})".format(name, attributes)
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        return self.__class__ is other.__class__ and \
+            all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
 
 
 # COLOR
 class Color(Value):
+    __slots__ = ['red', 'green', 'blue', 'white', 'alpha', 'name']
+
     def __init__(self, red, green, blue, white=0, alpha=255, name=''):
         self.red = red
         self.green = green
@@ -119,13 +138,17 @@ class Color(Value):
         self.alpha = alpha
         self.name = name
 
-    def interpolate(self, other, ratio):
+    def interpolate_into(self, other, ratio, dest):
+        # named colors are not interpolated
         if self.name != '' or other.name != '':
-            return self.name
-        newcolor = {}
-        for name in ['red', 'green', 'blue', 'white', 'alpha']:
-            newcolor[name] = interpolate(getattr(self, name), getattr(other, name), ratio)
-        return Color(**newcolor)
+            return self.copy_into(dest)
+        dest.red = int(self.red + (other.red - self.red) * ratio)
+        dest.green = int(self.green + (other.green - self.green) * ratio)
+        dest.blue = int(self.blue + (other.blue - self.blue) * ratio)
+        dest.white = int(self.white + (other.white - self.white) * ratio)
+        dest.alpha = int(self.alpha + (other.alpha - self.alpha) * ratio)
+        dest.name = ''
+        return dest
 
 
 def parse_color(color):
@@ -162,11 +185,14 @@ def parse_color(color):
 
 # STROBE
 class Strobe(Value):
+    __slots__ = ['speed']
+
     def __init__(self, speed):
         self.speed = speed
 
-    def interpolate(self, other, ratio):
-        return Strobe(interpolate(self.speed, other.speed, ratio))
+    def interpolate_into(self, other, ratio, dest):
+        dest.speed = interpolate(self.speed, other.speed, ratio)
+        return dest
 
 
 def parse_strobe(strobe):
@@ -176,13 +202,16 @@ def parse_strobe(strobe):
 
 # PULSE
 class Pulse(Value):
+    __slots__ = ['direction', 'speed']
+
     def __init__(self, direction, speed):
         self.direction = direction
         self.speed = speed
 
-    def interpolate(self, other, ratio):
-        return Pulse(self.direction,
-                     interpolate(self.speed, other.speed, ratio))
+    def interpolate_into(self, other, ratio, dest):
+        dest.direction = self.direction
+        dest.speed = interpolate(self.speed, other.speed, ratio)
+        return dest
 
 
 def parse_pulse(pulse):
@@ -200,13 +229,16 @@ def parse_pulse(pulse):
 
 # AUTO
 class Auto(Value):
+    __slots__ = ['name', 'speed']
+
     def __init__(self, name, speed):
         self.name = name
         self.speed = speed
 
-    def interpolate(self, other, ratio):
-        return Auto(self.name,
-                    interpolate(self.speed, other.speed, ratio))
+    def interpolate_into(self, other, ratio, dest):
+        dest.name = self.name
+        dest.speed = interpolate(self.speed, other.speed, ratio)
+        return dest
 
 
 def parse_auto(auto):
@@ -227,6 +259,8 @@ def parse_auto(auto):
 
 # ROTATION
 class Rotation(Value):
+    __slots__ = ['mode', 'position', 'speed']
+
     def __init__(self, position=None, speed=None):
         if position is not None:
             self.mode = 'manual'
@@ -239,12 +273,17 @@ class Rotation(Value):
         else:
             raise Exception("Expected at least position or speed for Rotation")
 
-    def interpolate(self, other, ratio):
-        if self.mode == 'manual' and other.mode == 'manual':
-            return Rotation(position=interpolate(self.position, other.position, ratio))
-        elif self.mode == 'auto' and other.mode == 'auto':
-            return Rotation(speed=interpolate(self.speed, other.speed, ratio))
-        return self
+    def interpolate_into(self, other, ratio, dest):
+        if self.mode != other.mode:
+            return self.copy_into(dest)
+        dest.mode = self.mode
+        if self.mode == 'manual':
+            dest.position = interpolate(self.position, other.position, ratio)
+            dest.speed = 0
+        else:
+            dest.position = 0
+            dest.speed = interpolate(self.speed, other.speed, ratio)
+        return dest
 
 
 def parse_rotation(rotation):
@@ -313,8 +352,21 @@ PROPERTIES_PARSING_FUNCTIONS = {
 }
 
 
+def parse_style(content):
+    """ Parse the tokens of a declarations block and return a dict() of property names and values
+        Whitespace in values is normalized and the last declaration of a property wins
+    """
+    style = {}
+    for decl in tinycss2.parse_declaration_list(content, skip_whitespace=True, skip_comments=True):
+        if decl.type == 'declaration':
+            style[decl.lower_name] = " ".join(tinycss2.serialize(decl.value).split())
+    return style
+
+
 def parse_declarations(style):
-    """ Parse all implemented DSS declarations of a declarations block and return a list of declarations """
+    """ Parse all implemented DSS declarations of a declarations block and return a list of declarations
+        style is a dict() of property names and values (see parse_style)
+    """
     declarations = []
     for prop, func in PROPERTIES_PARSING_FUNCTIONS.items():
         if prop in style:
@@ -323,36 +375,47 @@ def parse_declarations(style):
     return declarations
 
 
+def split_selectors(prelude):
+    """ Split the prelude of a qualified rule on commas and return the selectors text """
+    selectors = [[]]
+    for token in prelude:
+        if token.type == 'literal' and token.value == ',':
+            selectors.append([])
+        else:
+            selectors[-1].append(token)
+    return [tinycss2.serialize(tokens).strip() for tokens in selectors]
+
+
 def parse_selectors(selector_list):
     selectors = []
     for s in selector_list:
-        if s.selectorText[0] == "#":
+        if s[:1] == "#":
             typ = 'id'
-            value = s.selectorText[1:]
-        elif s.selectorText[0] == '.':
+            value = s[1:]
+        elif s[:1] == '.':
             typ = 'class'
-            value = s.selectorText[1:]
-        elif re.match(r'[\w-]+', s.selectorText):
+            value = s[1:]
+        elif re.match(r'[\w-]+', s):
             typ = 'tag'
-            value = s.selectorText
+            value = s
         else:
-            raise NotImplementedError("'{}' selector type is not implemented".format(s.selectorText))
+            raise NotImplementedError("'{}' selector type is not implemented".format(s))
         selectors.append(Selector(type=typ, value=value))
     return selectors
 
 
+def parse_rule(rule):
+    selectors = parse_selectors(split_selectors(rule.prelude))
+    declarations = parse_declarations(parse_style(rule.content))
+    return Rule(selectors=selectors, declarations=declarations)
+
+
 def parse_rules(css):
-    """ Parse a DSS stylesheet consisting of several declarations block and return a CSS object
+    """ Parse the style rules of a DSS stylesheet (parsed by tinycss2) and return a list of Rule
         Currently only supports simple selectors (not composed ones like `tag#class`)
         Selectors can be tag/id/class-based
     """
-    rules = []
-    for r in css.cssRules:
-        if r.typeString == 'STYLE_RULE':
-            selectors = parse_selectors(r.selectorList)
-            declarations = parse_declarations(r.style)
-            rules.append(Rule(selectors=selectors, declarations=declarations))
-    return rules
+    return [parse_rule(r) for r in css if r.type == 'qualified-rule']
 
 KeyframeRule = namedtuple('KeyframeRule', ['name', 'frames'])
 Keyframe = namedtuple('Keyframe', ['selector', 'declarations'])
@@ -398,8 +461,7 @@ def parse_keyframe_frames(content):
                 is_percentage = True
             # when we encouter a block, we parse it
             elif token.type == '{} block':
-                style = cssutils.parseStyle(" ".join([x.serialize() for x in token.content]))
-                declarations = parse_declarations(style)
+                declarations = parse_declarations(parse_style(token.content))
                 for perc in percentages:
                     frames.append(Keyframe(selector=perc, declarations=declarations))
                 percentages = []
@@ -409,22 +471,39 @@ def parse_keyframe_frames(content):
     return sorted(frames, key=lambda f: f.selector)
 
 
+def parse_keyframe_rule(rule):
+    name = parse_keyframe_name(rule.prelude)
+    return KeyframeRule(name=name, frames=parse_keyframe_frames(rule.content))
+
+
+def is_keyframes(rule):
+    return rule.type == 'at-rule' and rule.lower_at_keyword == 'keyframes'
+
+
 def parse_keyframes(css):
     """ Parse all @keyframes at-rules of a css file and return a dict() """
     keyframes = {}
     for r in css:
-        if r.type == 'at-rule' and r.at_keyword == 'keyframes':
-            name = parse_keyframe_name(r.prelude)
-            frames = parse_keyframe_frames(r.content)
-            keyframes[name] = KeyframeRule(name=name, frames=frames)
+        if is_keyframes(r):
+            keyframe = parse_keyframe_rule(r)
+            keyframes[keyframe.name] = keyframe
     return keyframes
 
 
+def parse_stylesheet(text):
+    """ Parse a DSS stylesheet in a single pass and return a CSS object """
+    rules = []
+    keyframes = {}
+    for r in tinycss2.parse_stylesheet(text, skip_whitespace=True, skip_comments=True):
+        if r.type == 'qualified-rule':
+            rules.append(parse_rule(r))
+        elif is_keyframes(r):
+            keyframe = parse_keyframe_rule(r)
+            keyframes[keyframe.name] = keyframe
+    return CSS(rules=rules, keyframes=keyframes)
+
+
 def parse_css_file(filename):
     """ Parse a DSS file """
-    css = cssutils.parseFile(filename)
-    rules = parse_rules(css)
     with open(filename) as f:
-        css = tinycss2.parse_stylesheet(f.read())
-    keyframes = parse_keyframes(css)
-    return CSS(rules=rules, keyframes=keyframes)
+        return parse_stylesheet(f.read())
@@ -0,0 +1,132 @@
+""" DMX over a serial port (e.g. an Arduino or a USB DMX interface on /dev/ttyACM0)
+
+Frames are written as packets of the Enttec DMX USB Pro protocol:
+
+    start (0x7E), label, length of the data (2 bytes, little endian), data, end (0xE7)
+
+A full universe uses the label 6 ("send DMX"), its data is the DMX start code followed by the
+channels. A receiver checks the end byte and the length to detect partial packets, and
+resynchronizes on the next start byte. All the packets of a frame are sent in a single write.
+
+Delta updates are an extension for custom firmwares, not part of the Enttec protocol (a DMX USB
+Pro ignores them), and are off by default: when few channels changed since the last frame, only
+the runs of changed channels are sent, each in its own packet with the label 0x80, whose data is
+the index of the first channel (2 bytes, little endian) followed by the values.
+"""
+from logging import getLogger
+import struct
+
+import serial
+
+from .backend import RETRY, Backend
+from .plan import DMX_CHANNELS
+from .recording import diff_runs
+
+logger = getLogger(__name__)
+
+START = 0x7E
+END = 0xE7
+SEND_DMX = 6
+SEND_CHANNELS = 0x80
+
+PACKET = struct.Struct('<BBH')
+OFFSET = struct.Struct('<H')
+START_CODE = 0
+
+PORT = "/dev/ttyACM0"
+BAUDRATE = 115200
+# the serial device only drives a single universe
+UNIVERSE = 1
+
+
+def write_packet(buffer, offset, label, *data):
+    """ Write a packet holding the concatenated data into buffer at offset, return the offset after it """
+    length = sum(len(d) for d in data)
+    PACKET.pack_into(buffer, offset, START, label, length)
+    offset += PACKET.size
+    for d in data:
+        buffer[offset:offset + len(d)] = d
+        offset += len(d)
+    buffer[offset] = END
+    return offset + 1
+
+
+class DmxSerial(Backend):
+    """ Send a universe to a serial port
+
+        The port is opened on the first frame and opened again after an error (see lib.backend.Backend).
+        Frames are written in one bulk write, or in writes of at most chunk_size bytes for devices
+        with a small buffer. Only the changed channels are sent when delta is True (for custom firmwares,
+        see above), the full universe is sent after a reconnection and when the frame did not change
+        (a keep-alive, see lib.output.Output).
+    """
+    def __init__(self, port=PORT, baudrate=BAUDRATE, *, universe=UNIVERSE, chunk_size=None, delta=False,
+                 retry=RETRY):
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.universe = universe
+        self.chunk_size = chunk_size
+        self.delta = delta
+        self.retry = retry
+        self.serial = None
+        # last frame sent, None when the device state is unknown
+        self.last = None
+        self.buffer = bytearray(PACKET.size + 1 + DMX_CHANNELS + 1)
+        self.view = memoryview(self.buffer)
+        self.start_code = bytes([START_CODE])
+
+    def connect(self):
+        self.serial = serial.Serial(self.port, self.baudrate, timeout=.1, write_timeout=1)
+        logger.info("opened {} at {} bauds".format(self.port, self.baudrate))
+        self.last = None
+
+    def close(self):
+        super().close()
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+
+    def health(self):
+        return dict(super().health(), port=self.port)
+
+    def encode(self, frame):
+        """ Write the packets of frame into the buffer and return their size """
+        last = self.last
+        if self.delta and last is not None and last != frame:
+            runs = diff_runs(last, frame)
+            size = sum(PACKET.size + OFFSET.size + end - start + 1 for start, end in runs)
+            # a full frame is smaller when many channels changed
+            if size < len(self.buffer):
+                view = memoryview(frame)
+                offset = 0
+                for start, end in runs:
+                    offset = write_packet(self.buffer, offset, SEND_CHANNELS, OFFSET.pack(start), view[start:end])
+                return offset
+        return write_packet(self.buffer, 0, SEND_DMX, self.start_code, frame)
+
+    def write_chunks(self, data):
+        if not self.chunk_size:
+            self.serial.write(data)
+            return
+        for i in range(0, len(data), self.chunk_size):
+            self.serial.write(data[i:i + self.chunk_size])
+
+    def write(self, universe, frame):
+        if universe != self.universe:
+            return
+        size = self.encode(frame)
+        try:
+            self.write_chunks(self.view[:size])
+        except (serial.SerialException, OSError) as e:
+            self.errors += 1
+            logger.warning("lost {}: {}".format(self.port, e))
+            self.close()
+            return
+        if self.last is None:
+            self.last = bytearray(frame)
+        else:
+            self.last[:] = frame
+
+    def __str__(self):
+        return self.port
@@ -1,11 +1,16 @@
-import json
+from collections.abc import Mapping
+from functools import lru_cache
 from glob import glob
 from logging import getLogger
+import json
+import os
 
-from jsonschema import validate
+from jsonschema.validators import validator_for
 
 logger = getLogger(__name__)
 
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "devices")
+
 # BASIC
 address_schema = {
     "type": "integer",
@@ -159,14 +164,94 @@ schema = {
 }
 
 
-def load_devices():
-    devices = {}
-    for file in glob("devices/*"):
+@lru_cache(maxsize=1)
+def get_validator():
+    """ Return a validator for device profiles, the schema is checked only once """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+class DeviceLibrary(Mapping):
+    """ Device profiles found in one or more directories, indexed by name
+
+        Profiles are loaded and validated the first time they are used. They are
+        expected in `<name>.json` files, other files are only read (not validated)
+        when a name cannot be found that way. When several directories provide the
+        same device, the first one wins.
+        The library is scanned at most once, on the first name that is not a file name
+        (e.g. the <root> tag of a tree), which reads the names declared by the other files
+        but only validates the profiles used. Names that are not devices are remembered.
+    """
+    def __init__(self, paths=None):
+        self.paths = paths or [DEFAULT_LIBRARY]
+        self._files = {}
+        for path in reversed(self.paths):
+            for file in sorted(glob(os.path.join(path, "*.json"))):
+                self._files[os.path.splitext(os.path.basename(file))[0]] = file
+        self._devices = {}
+        # names known not to be devices
+        self._missing = set()
+        self._scanned = False
+
+    def files(self):
+        return sorted(set(self._files.values()))
+
+    def load(self, file):
         with open(file) as f:
             data = json.load(f)
-        validate(data, schema)
-        name = data['name']
-        if name in devices:
-            logger.warn("overwriting device {}".format(name))
-        devices[name] = data['mapping']
-    return devices
+        get_validator().validate(data)
+        return data
+
+    def scan(self):
+        """ Index all the files by the name they declare instead of their file name """
+        files = {}
+        for path in reversed(self.paths):
+            for file in sorted(glob(os.path.join(path, "*.json"))):
+                with open(file) as f:
+                    name = json.load(f).get('name')
+                if name in files:
+                    logger.warning("overwriting device {}".format(name))
+                files[name] = file
+        self._files = files
+        self._missing.clear()
+        self._scanned = True
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, name):
+        if name in self._devices:
+            return self._devices[name]
+        if name in self._missing:
+            raise KeyError(name)
+        file = self._files.get(name)
+        if file is not None:
+            data = self.load(file)
+            if data['name'] == name:
+                self._devices[name] = data['mapping']
+                return data['mapping']
+        if not self._scanned:
+            self.scan()
+            return self[name]
+        self._missing.add(name)
+        raise KeyError(name)
+
+    def __iter__(self):
+        if not self._scanned:
+            self.scan()
+        return iter(self._files)
+
+    def __len__(self):
+        if not self._scanned:
+            self.scan()
+        return len(self._files)
+
+
+def load_devices(paths=None):
+    """ Return the DeviceLibrary of the given directories (default: the devices directory of css2dmx) """
+    return DeviceLibrary(paths)
@@ -0,0 +1,120 @@
+""" Device profiles compiled into channel mappers
+
+A mapper resolves everything the compute_dmx_* functions look up in a device profile
+(channel offsets, ranges and enums) once, so that the frame plan writes the channels of a
+property directly into a universe buffer. Ranges are turned into tables of the 256 possible
+values, computed with the same arithmetic as compute_dmx_value.
+"""
+
+
+class Channel:
+    """ A single channel of a device property """
+    __slots__ = ['index', 'low', 'high', 'table', 'enum']
+
+    def __init__(self, attr_desc):
+        # channel numbers start at 1
+        self.index = attr_desc['chan'] - 1
+        self.low, self.high = attr_desc.get('range', [0, 255])
+        self.table = bytes(int(self.low + (self.high - self.low) * v / 255) for v in range(256))
+        self.enum = {name: r[0] for name, r in attr_desc['enum'].items()} if 'enum' in attr_desc else None
+
+    def value(self, css_value):
+        if self.enum is not None:
+            return self.enum[css_value]
+        if 0 <= css_value <= 255:
+            return self.table[css_value]
+        return int(self.low + (self.high - self.low) * css_value / 255)
+
+
+class PropertyMapper:
+    """ Compiled channels of a device property
+
+        `required` attributes missing from the profile only raise a KeyError when
+        the property is used, as with the compute_dmx_* functions.
+    """
+    __slots__ = ['channels']
+
+    def __init__(self, desc, required=(), optional=()):
+        self.channels = self.resolve(desc, required, optional)
+
+    @staticmethod
+    def resolve(desc, required, optional=()):
+        """ Return the channels as (attribute, index, table, Channel) tuples,
+            or the name of the first missing required channel
+        """
+        for name in required:
+            if name not in desc:
+                return name
+        channels = []
+        for name in list(required) + list(optional):
+            if name in desc:
+                channel = Channel(desc[name])
+                # enums have no table
+                table = channel.table if channel.enum is None else None
+                channels.append((name, channel.index, table, channel))
+        return channels
+
+    def select(self, value):
+        return self.channels
+
+    def resolved(self, value):
+        channels = self.select(value)
+        # the name of the missing channel
+        if isinstance(channels, str):
+            raise KeyError(channels)
+        return channels
+
+    def write(self, value, frame, offset):
+        """ Write the channels of value into frame for a device at address offset + 1 """
+        size = len(frame)
+        for attr, index, table, channel in self.resolved(value):
+            index += offset
+            if 0 <= index < size:
+                css_value = getattr(value, attr)
+                frame[index] = table[css_value] if table is not None and 0 <= css_value <= 255 \
+                    else channel.value(css_value)
+
+    def pairs(self, value, address):
+        """ Return the (address, value) pairs of value, as the compute_dmx_* functions """
+        return [(index + address, channel.value(getattr(value, attr)))
+                for attr, index, _, channel in self.resolved(value)]
+
+
+class ColorMapper(PropertyMapper):
+    __slots__ = ['named']
+
+    def __init__(self, desc):
+        super().__init__(desc, ['red', 'green', 'blue'], ['white', 'alpha'])
+        self.named = self.resolve(desc, ['name'])
+
+    def select(self, color):
+        return self.named if color.name != '' else self.channels
+
+
+class RotationMapper(PropertyMapper):
+    __slots__ = ['auto']
+
+    def __init__(self, desc):
+        super().__init__(desc, ['position'])
+        self.auto = self.resolve(desc, ['speed'])
+
+    def select(self, rotation):
+        if rotation.mode == 'manual':
+            return self.channels
+        elif rotation.mode == 'auto':
+            return self.auto
+        return []
+
+
+MAPPERS = {
+    'color': ColorMapper,
+    'strobe': lambda desc: PropertyMapper(desc, ['speed']),
+    'pulse': lambda desc: PropertyMapper(desc, ['direction', 'speed']),
+    'auto': lambda desc: PropertyMapper(desc, ['name'], ['speed']),
+    'rotation': RotationMapper
+}
+
+
+def compile_device(device):
+    """ Compile a device profile into a dict() of PropertyMapper, indexed by property """
+    return {prop: MAPPERS[prop](desc) for prop, desc in device.items() if prop in MAPPERS}
@@ -0,0 +1,157 @@
+""" DMX over the network: Art-Net and sACN (E1.31) senders, without OLA in between
+
+Each universe has its own packet, allocated once with its headers filled in: sending a frame
+only copies the channels and the sequence number into it before a single sendto() on a
+non-blocking UDP socket. A packet that does not fit in the socket buffer is dropped instead
+of delaying the other universes, the next frame replaces it anyway.
+"""
+from logging import getLogger
+import socket
+import struct
+import uuid
+
+from . import stats
+from .backend import Backend
+from .plan import DMX_CHANNELS
+
+logger = getLogger(__name__)
+
+ARTNET_PORT = 6454
+ARTNET_BROADCAST = '255.255.255.255'
+
+SACN_PORT = 5568
+SACN_PRIORITY = 100
+SACN_SOURCE = 'css2dmx'
+
+
+def artnet_packet(universe):
+    """ Return an ArtDmx packet of universe, sent to the Art-Net port-address of the same number """
+    packet = bytearray(18 + DMX_CHANNELS)
+    packet[0:8] = b'Art-Net\0'
+    # OpDmx, little endian
+    struct.pack_into('<H', packet, 8, 0x5000)
+    # protocol version 14, sequence, physical port
+    struct.pack_into('>HBB', packet, 10, 14, 0, 0)
+    # port-address (net, sub-net and universe) little endian, then the length big endian
+    struct.pack_into('<H', packet, 14, universe & 0x7fff)
+    struct.pack_into('>H', packet, 16, DMX_CHANNELS)
+    return packet
+
+
+def sacn_packet(universe, cid, source=SACN_SOURCE, priority=SACN_PRIORITY):
+    """ Return an E1.31 data packet of universe, cid is the 16 bytes identifying the sender """
+    packet = bytearray(126 + DMX_CHANNELS)
+    size = len(packet)
+    # root layer
+    struct.pack_into('>HH12sHI16s', packet, 0, 0x0010, 0, b'ASC-E1.17\0\0\0', 0x7000 | (size - 16), 0x4, cid)
+    # framing layer: source name, priority, synchronization address, sequence, options and universe
+    struct.pack_into('>HI64sBHBBH', packet, 38, 0x7000 | (size - 38), 0x2, source.encode()[:63], priority, 0, 0, 0,
+                     universe)
+    # DMP layer: the start code and the channels
+    struct.pack_into('>HBBHHH', packet, 115, 0x7000 | (size - 115), 0x2, 0xa1, 0, 1, DMX_CHANNELS + 1)
+    return packet
+
+
+def sacn_multicast(universe):
+    """ Return the multicast group of a sACN universe """
+    return '239.255.{}.{}'.format(universe >> 8, universe & 0xff)
+
+
+class UDPSender(Backend):
+    """ Send universes in preallocated packets to their destination
+
+        Subclasses implement packet(universe), destination(universe) and set SEQUENCE and DATA,
+        the offsets of the sequence number and of the channels in a packet.
+        destinations maps universes to the host receiving them, other universes go to host.
+    """
+    PORT = None
+    SEQUENCE = None
+    DATA = None
+
+    def __init__(self, host=None, destinations=None, *, port=None):
+        super().__init__()
+        self.host = host
+        # universes are strings in the keys of outputs.json
+        self.destinations = {int(universe): host for universe, host in (destinations or {}).items()}
+        self.port = port or self.PORT
+        self.socket = None
+        self.packets = {}
+        self.views = {}
+        self.addresses = {}
+        self.dropped = 0
+
+    def connect(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.socket.setblocking(False)
+
+    def destination(self, universe):
+        return self.destinations.get(universe, self.host)
+
+    def add_universe(self, universe):
+        packet = self.packets[universe] = self.packet(universe)
+        self.views[universe] = memoryview(packet)[self.DATA:self.DATA + DMX_CHANNELS]
+        self.addresses[universe] = (self.destination(universe), self.port)
+
+    def write(self, universe, frame):
+        packet = self.packets.get(universe)
+        if packet is None:
+            self.add_universe(universe)
+            packet = self.packets[universe]
+        self.views[universe][:] = frame
+        packet[self.SEQUENCE] = packet[self.SEQUENCE] % 255 + 1
+        try:
+            self.socket.sendto(packet, self.addresses[universe])
+        except BlockingIOError:
+            self.dropped += 1
+            stats.count('dropped packets ' + type(self).__name__)
+        except OSError as e:
+            self.errors += 1
+            logger.warning("cannot send universe {} to {}: {}".format(universe, self.addresses[universe], e))
+
+    def close(self):
+        super().close()
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def health(self):
+        return dict(super().health(), universes=len(self.packets), dropped=self.dropped)
+
+
+class ArtNet(UDPSender):
+    """ Send universes with Art-Net, broadcast unless a host is given """
+    PORT = ARTNET_PORT
+    SEQUENCE = 12
+    DATA = 18
+
+    def __init__(self, host=ARTNET_BROADCAST, destinations=None, *, port=None):
+        super().__init__(host, destinations, port=port)
+
+    def packet(self, universe):
+        return artnet_packet(universe)
+
+
+class SACN(UDPSender):
+    """ Send universes with sACN (E1.31), to the multicast group of each universe unless a host is given """
+    PORT = SACN_PORT
+    SEQUENCE = 111
+    DATA = 126
+
+    def __init__(self, host=None, destinations=None, *, port=None, source=SACN_SOURCE, priority=SACN_PRIORITY,
+                 ttl=1):
+        super().__init__(host, destinations, port=port)
+        self.ttl = ttl
+        self.source = source
+        self.priority = priority
+        self.cid = uuid.uuid4().bytes
+
+    def connect(self):
+        super().connect()
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+
+    def destination(self, universe):
+        return super().destination(universe) or sacn_multicast(universe)
+
+    def packet(self, universe):
+        return sacn_packet(universe, self.cid, self.source, self.priority)
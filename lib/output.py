@@ -0,0 +1,338 @@
+""" Outputs: the threads sending the frames of the engine to the backends
+
+Each output runs on its own thread with its own refresh rate and backpressure policy, so a
+slow device never delays the next frame nor the other outputs. The outputs of a project can
+be declared in an outputs.json file (see load_outputs), e.g.
+
+    {"outputs": [
+        {"backend": "serial", "port": "/dev/ttyACM0", "fps": 25},
+        {"backend": "artnet", "host": "10.0.0.255", "fps": 44, "universes": [1, 2, 3]},
+        {"name": "stage", "backend": "sacn", "destinations": {"4": "10.0.1.20"}, "universes": [4]}
+    ]}
+
+Besides the options of the backend, an output takes a name (default: the backend), a maximum
+refresh rate `fps` (default: every frame), a `policy` (see BACKPRESSURE), a `keepalive`
+(see Output) and the list of `universes` it sends (default: all).
+"""
+from functools import lru_cache
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic, perf_counter_ns, sleep
+import array
+import json
+
+from jsonschema.validators import validator_for
+
+from . import stats
+from .backend import RETRY, Backend, Callback
+from .dmxserial import DmxSerial
+from .network import SACN, ArtNet
+
+logger = getLogger(__name__)
+
+# seconds after which an unchanged universe is sent again, receivers may blackout without updates
+KEEPALIVE = 1.0
+
+# latest: frames published while the output is busy or waiting for its refresh rate are dropped
+# block: the engine waits for the output before publishing the next frame, slowing down every output
+BACKPRESSURE = ['latest', 'block']
+
+
+class OLA(Backend):
+    """ Send universes to the OLA daemon """
+    def __init__(self, retry=RETRY):
+        super().__init__()
+        self.retry = retry
+        self.client = None
+        # buffers handed to OLA, allocated once and updated in place on every frame
+        self.buffers = {}
+
+    def connect(self):
+        import ola.ClientWrapper
+        self.client = ola.ClientWrapper.OlaClient()
+
+    def close(self):
+        super().close()
+        self.client = None
+
+    def write(self, universe, frame):
+        data = self.buffers.get(universe)
+        if data is None:
+            data = self.buffers[universe] = array.array('B', bytes(len(frame)))
+        memoryview(data)[:] = frame
+        if not self.client.SendDmx(universe=universe, data=data):
+            self.errors += 1
+            logger.warning("lost the connection to OLA")
+            self.close()
+
+
+BACKENDS = {'ola': OLA, 'serial': DmxSerial, 'artnet': ArtNet, 'sacn': SACN}
+
+
+def register_backend(name, cls):
+    """ Make a Backend subclass available to outputs.json under name """
+    BACKENDS[name] = cls
+
+
+def send_changed(frames, sent, send, stale=()):
+    """ Send the universes whose frame changed since the last call and the stale universes, even unchanged
+        sent holds the last sent frames, a universe is only recorded there once send() returned,
+        so that it is sent again by the next call when send() raises. Return the list of universes sent
+    """
+    universes = []
+    for universe, frame in frames.items():
+        last = sent.get(universe)
+        if last is not None and last == frame and universe not in stale:
+            continue
+        send(universe, frame)
+        if last is None:
+            sent[universe] = bytearray(frame)
+        else:
+            last[:] = frame
+        universes.append(universe)
+    return universes
+
+
+def copy_frames(src, dst, universes=None):
+    """ Copy the frames of src into dst, only the given universes when not None, return whether any frame changed """
+    changed = False
+    for universe, frame in src.items():
+        if universes is not None and universe not in universes:
+            continue
+        buf = dst.get(universe)
+        if buf is None:
+            dst[universe] = bytearray(frame)
+            changed = True
+        elif buf != frame:
+            buf[:] = frame
+            changed = True
+    return changed
+
+
+class Mailbox:
+    """ Single slot holding the latest frames
+
+        Publishing overwrites the previous frames instead of queuing them, so a slow
+        reader only ever gets the most recent frames. Each reader keeps track of the
+        last version it has read, frames identical to the previous ones do not make a new version.
+        Subscribed readers get every version: publishing waits until they acknowledge the previous one.
+    """
+    def __init__(self):
+        self._condition = Condition()
+        self._frames = {}
+        self._version = 0
+        self._closed = False
+        # last version acknowledged by each subscribed reader
+        self._readers = {}
+
+    def put(self, frames):
+        """ Publish frames, return the nanoseconds spent waiting for the subscribed readers """
+        with self._condition:
+            waited = 0
+            if self._readers:
+                start = perf_counter_ns()
+                self._condition.wait_for(
+                    lambda: self._closed or all(v >= self._version for v in self._readers.values()))
+                waited = perf_counter_ns() - start
+            if copy_frames(frames, self._frames):
+                self._version += 1
+                self._condition.notify_all()
+            return waited
+
+    def get(self, frames, version=0, timeout=None, universes=None):
+        """ Wait for frames newer than version and copy them into frames, only the given universes when not None
+            Return the version read, the same version on timeout or None when the mailbox is closed
+        """
+        with self._condition:
+            ready = self._condition.wait_for(lambda: self._version > version or self._closed, timeout)
+            if self._closed:
+                return None
+            if not ready:
+                return version
+            copy_frames(self._frames, frames, universes)
+            return self._version
+
+    def subscribe(self, reader):
+        with self._condition:
+            self._readers[reader] = self._version
+
+    def acknowledge(self, reader, version):
+        with self._condition:
+            if reader in self._readers:
+                self._readers[reader] = version
+                self._condition.notify_all()
+
+    def unsubscribe(self, reader):
+        with self._condition:
+            self._readers.pop(reader, None)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class Output(Thread):
+    """ Drain the latest frames of a mailbox and send the changed universes to a backend
+        send is a Backend (see lib.backend) or a send(universe, frame) function, the backend is closed
+        when the mailbox is. At most `fps` frames are sent per second when given, see BACKPRESSURE
+        for the policy. Unchanged universes are sent again every `keepalive` seconds, never when
+        keepalive is 0, and every universe is sent again after the backend reconnects. Frames that
+        could not be sent are retried every `retry` seconds of the backend, even when nothing changes.
+    """
+    def __init__(self, name, mailbox, send, keepalive=KEEPALIVE, *, fps=None, policy='latest', universes=None):
+        super().__init__(name=name, daemon=True)
+        if policy not in BACKPRESSURE:
+            raise Exception("Expected one of the policies {}, got {}".format(", ".join(BACKPRESSURE), policy))
+        self.mailbox = mailbox
+        self.backend = send if isinstance(send, Backend) else Callback(send)
+        self.keepalive = keepalive
+        self.fps = fps
+        self.policy = policy
+        self.universes = set(universes) if universes is not None else None
+        self.frames = {}
+        self.sent = {}
+        # last time each universe was sent
+        self.times = {}
+        self.count = 0
+        self.dropped = 0
+        # whether some universes could not be sent
+        self.pending = False
+        if policy == 'block':
+            mailbox.subscribe(self)
+
+    def stale(self, now):
+        if not self.keepalive:
+            return ()
+        return {universe for universe, time in self.times.items() if now - time >= self.keepalive}
+
+    def health(self):
+        return dict(self.backend.health(), backend=str(self.backend), fps=self.fps, policy=self.policy,
+                    sent=self.count, dropped=self.dropped)
+
+    def transmit(self):
+        """ Send the frames to the backend, return whether it was attempted (the backend is connected) """
+        backend = self.backend
+        connected = backend.connected
+        self.pending = not backend.open()
+        if self.pending:
+            return False
+        if not connected:
+            # the device state is unknown
+            self.sent.clear()
+        now = monotonic()
+        try:
+            for universe in send_changed(self.frames, self.sent, backend.write, self.stale(now)):
+                self.times[universe] = now
+            backend.flush()
+        except Exception as e:
+            backend.errors += 1
+            self.pending = True
+            logger.warning("output {} failed: {}".format(self.name, e))
+        self.count += 1
+        return True
+
+    def run(self):
+        version = 0
+        try:
+            while True:
+                timeout = self.keepalive or None
+                if self.pending:
+                    timeout = min(timeout or self.backend.retry, self.backend.retry)
+                latest = self.mailbox.get(self.frames, version, timeout, self.universes)
+                if latest is None:
+                    return
+                if latest - version > 1:
+                    self.dropped += latest - version - 1
+                    stats.count('dropped ' + self.name, latest - version - 1)
+                version = latest
+                start = perf_counter_ns()
+                transmitted = self.transmit()
+                self.mailbox.acknowledge(self, version)
+                end = perf_counter_ns()
+                if transmitted:
+                    stats.record('transmit ' + self.name, end - start)
+                if self.fps:
+                    delay = 1 / self.fps - (end - start) / 1e9
+                    if delay > 0:
+                        sleep(delay)
+        finally:
+            self.mailbox.unsubscribe(self)
+            self.backend.close()
+
+
+def start_outputs(mailbox, senders, keepalive=KEEPALIVE):
+    """ Start one Output thread per (name, send) or (name, send, options) and return them
+        options are the keyword arguments of Output, keepalive is the default keepalive
+    """
+    outputs = []
+    for name, send, *options in senders:
+        options = {'keepalive': keepalive, **(options[0] if options else {})}
+        output = Output(name, mailbox, send, **options)
+        stats.gauge('output ' + name, output.health)
+        outputs.append(output)
+    for output in outputs:
+        output.start()
+    return outputs
+
+
+# options of an output in outputs.json, the other keys are the options of its backend
+OUTPUT_OPTIONS = ['name', 'backend', 'fps', 'policy', 'keepalive', 'universes']
+
+schema = {
+    "$schema": "http://json-schema.org/schema#",
+    "type": "object",
+    "properties": {
+        "outputs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "backend": {"type": "string"},
+                    "fps": {"type": "number", "exclusiveMinimum": 0},
+                    "policy": {"enum": BACKPRESSURE},
+                    "keepalive": {"type": "number", "minimum": 0},
+                    "universes": {"type": "array", "items": {"type": "integer", "minimum": 0}}
+                },
+                "required": ["backend"]
+            }
+        }
+    },
+    "required": ["outputs"],
+    "additionalProperties": False
+}
+
+
+@lru_cache(maxsize=1)
+def get_validator():
+    """ Return a validator for outputs.json, the schema is checked only once """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def load_outputs(filename):
+    """ Return the outputs declared in an outputs.json file as a list of (name, backend, options)
+        to give to start_outputs, the backends are not connected yet
+    """
+    with open(filename) as f:
+        data = json.load(f)
+    get_validator().validate(data)
+    outputs = []
+    for config in data['outputs']:
+        kind = config['backend']
+        if kind not in BACKENDS:
+            raise Exception("Expected one of the backends {}, got {}".format(", ".join(sorted(BACKENDS)), kind))
+        name = config.get('name', kind)
+        if name in [output[0] for output in outputs]:
+            raise Exception("Expected unique output names, got {} twice".format(name))
+        arguments = {key: value for key, value in config.items() if key not in OUTPUT_OPTIONS}
+        try:
+            backend = BACKENDS[kind](**arguments)
+        except TypeError as e:
+            raise Exception("Expected the options of the {} backend: {}".format(kind, e))
+        options = {key: config[key] for key in ['fps', 'policy', 'keepalive', 'universes'] if key in config}
+        outputs.append((name, backend, options))
+    return outputs
@@ -0,0 +1,113 @@
+""" Compute the universes of a plan in parallel, in worker processes
+
+The universes of a plan are split between the workers, each worker computes its own
+universes directly into a block of shared memory holding all the frames. The main
+process only tells the workers the time of the next frame and waits for them, so the
+frames never go through a pipe.
+
+Workers are forked, they inherit the plan and the shared memory instead of unpickling them.
+"""
+from copy import copy
+from multiprocessing import get_context, shared_memory
+import signal
+
+from .plan import DMX_CHANNELS
+
+
+def universe_costs(plan):
+    """ Return a rough cost of computing each universe of a plan """
+    costs = {universe: 1 for universe in plan.frames}
+    for node in plan.nodes:
+        costs[node.universe] += len(node.steps)
+    for batch in plan.batches:
+        # a vectorized batch costs far less than the same python nodes
+        costs[batch.universe] += len(batch) / 10
+    return costs
+
+
+def partition(plan, workers):
+    """ Split the universes of a plan into at most `workers` lists of universes of similar costs """
+    costs = universe_costs(plan)
+    parts = [[] for _ in range(min(workers, len(costs)))]
+    loads = [0] * len(parts)
+    # longest processing time first: give the most expensive universes to the least loaded workers
+    for universe in sorted(costs, key=lambda u: (-costs[u], u)):
+        i = loads.index(min(loads))
+        parts[i].append(universe)
+        loads[i] += costs[universe]
+    return [sorted(part) for part in parts]
+
+
+def subplan(plan, universes):
+    """ Return a copy of plan restricted to universes, sharing the compiled animations """
+    part = copy(plan)
+    part.base = {u: plan.base[u] for u in universes}
+    part.frames = {u: bytearray(DMX_CHANNELS) for u in universes}
+    part.nodes = [node for node in plan.nodes if node.universe in universes]
+    part.batches = [batch for batch in plan.batches if batch.universe in universes]
+    part.entries = {}
+    return part
+
+
+def work(connection, plan, buffer, offsets):
+    # the main process stops the workers on ctrl-c
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    plan.bind({universe: buffer[offsets[universe]:offsets[universe] + DMX_CHANNELS] for universe in plan.base})
+    while True:
+        t = connection.recv()
+        if t is None:
+            return
+        plan.compute(t)
+        connection.send(None)
+
+
+class ParallelPlan:
+    """ A plan whose universes are computed by worker processes
+
+        It has the compute(t) interface of a Plan, the frames it returns are views of the
+        shared memory and are only valid until the next call. Call close() to stop the workers.
+    """
+    def __init__(self, plan, workers):
+        universes = sorted(plan.frames)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, DMX_CHANNELS * len(universes)))
+        offsets = {universe: i * DMX_CHANNELS for i, universe in enumerate(universes)}
+        self.frames = {universe: self.memory.buf[offset:offset + DMX_CHANNELS] for universe, offset in offsets.items()}
+        context = get_context('fork')
+        self.connections = []
+        self.processes = []
+        for part in partition(plan, workers):
+            connection, child = context.Pipe()
+            process = context.Process(target=work, name="universes {}".format(part), daemon=True,
+                                      args=(child, subplan(plan, part), self.memory.buf, offsets))
+            process.start()
+            child.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def compute(self, t):
+        for connection in self.connections:
+            connection.send(t)
+        for connection in self.connections:
+            connection.recv()
+        return self.frames
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:
+                # the worker is already gone
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        for frame in self.frames.values():
+            frame.release()
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
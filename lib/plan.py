@@ -0,0 +1,268 @@
+from collections import namedtuple
+from logging import getLogger
+import math
+
+from .core import Timeline, compute_animation
+from .mapper import compile_device
+from . import stats, vectorized
+
+logger = getLogger(__name__)
+
+DMX_CHANNELS = 512
+
+# one entry per property of an animated node, in the order compute_style would write them
+# `pairs` holds the pre-resolved static (address, value) list, `groups` the animation groups driving the property
+# and `mapper` the compiled channels of the property (see lib.mapper)
+Step = namedtuple('Step', ['property', 'pairs', 'groups', 'mapper'])
+AnimatedNode = namedtuple('AnimatedNode', ['tag', 'device', 'universe', 'address', 'steps'])
+
+# compiled channels of a device node, reused as long as the node style does not change
+# the steps of an entry refer to their animations by (name, Animation) instead of group
+EntryStep = namedtuple('EntryStep', ['property', 'pairs', 'animations', 'mapper'])
+Entry = namedtuple('Entry', ['tag', 'device', 'universe', 'address', 'static', 'steps'])
+
+
+def animation_key(name, anim):
+    """ Return a hashable key identifying an animation and its timing """
+    function = anim.function
+    return (name, anim.duration, function.name, tuple(function.params),
+            anim.delay, anim.iteration, anim.direction)
+
+
+def animation_end(anim):
+    """ Return the time after which an animation no longer changes, inf when it never ends """
+    # reversed iterations never end (see animation_is_reversed and animation_is_on)
+    if anim.iteration == 'infinite' or anim.direction != 'normal':
+        return math.inf
+    return anim.delay + anim.duration * anim.iteration
+
+
+def write_pairs(frame, pairs, offset=0):
+    for address, value in pairs:
+        # remove 1 because DMX addresses start at 1
+        index = address + offset - 1
+        if 0 <= index < DMX_CHANNELS:
+            frame[index] = value
+
+
+class Plan:
+    """ A styled tree compiled into a flat channel program
+
+        Static channels are resolved once into a `base` frame per universe, animated nodes
+        only keep the steps that have to be evaluated on every frame. Nodes sharing the same
+        animation share one animation group, evaluated once per frame.
+        Large groups of similar nodes can be moved to vectorized batches (see lib.vectorized).
+        A universe is only computed again while its animations run, see update_ends().
+    """
+    def __init__(self, keyframes):
+        self.keyframes = keyframes
+        self.base = {}
+        self.frames = {}
+        self.animations = []
+        self.nodes = []
+        self.batches = []
+        self.entries = {}
+        # time after which the frame of each universe no longer changes
+        self.ends = {}
+        # compiled devices, by tag
+        self.mappers = {}
+        self._groups = {}
+        # compiled keyframes by name, and a copy for each animation group
+        self._keyframes = {}
+        self._timelines = []
+        # style and interpolated values of each animation group, updated in place on every frame
+        self._styles = []
+        self._values = []
+        # frame each group was last computed for
+        self._computed = []
+        self._frame = 0
+        # universes computed after their end, and whether each universe is computed in the current frame
+        self._settled = set()
+        self._live = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # entries are indexed by id() of tree nodes, which does not survive pickling
+        state['entries'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.bind(self.frames)
+
+    def bind(self, frames):
+        """ Compute into frames, a dict() of writable buffers by universe (e.g. views of shared memory) """
+        self.frames = frames
+        # the new frames hold nothing yet
+        self._settled = set()
+        for batch in self.batches:
+            batch.bind(frames)
+
+    def add_universe(self, universe):
+        if universe not in self.frames:
+            self.base[universe] = bytearray(DMX_CHANNELS)
+            self.frames[universe] = bytearray(DMX_CHANNELS)
+
+    def add_animation(self, name, anim):
+        key = animation_key(name, anim)
+        if key not in self._groups:
+            self._groups[key] = len(self.animations)
+            self.animations.append((name, anim))
+            if name not in self._keyframes:
+                self._keyframes[name] = Timeline(self.keyframes[name])
+            self._timelines.append(self._keyframes[name].copy())
+            self._styles.append({})
+            self._values.append({})
+            self._computed.append(None)
+        return self._groups[key]
+
+    def add_static(self, universe, pairs):
+        for address, value in pairs:
+            if not 1 <= address <= DMX_CHANNELS:
+                logger.warning("ignoring channel {} outside of universe {}".format(address, universe))
+        write_pairs(self.base[universe], pairs)
+
+    def add_entry(self, key, entry):
+        self.entries[key] = entry
+        self.add_universe(entry.universe)
+        for pairs in entry.static:
+            self.add_static(entry.universe, pairs)
+        if entry.steps:
+            steps = [Step(property=step.property, pairs=step.pairs,
+                          groups=tuple(self.add_animation(name, anim) for name, anim in step.animations),
+                          mapper=step.mapper)
+                     for step in entry.steps]
+            self.nodes.append(AnimatedNode(tag=entry.tag, device=entry.device, universe=entry.universe,
+                                           address=entry.address, steps=steps))
+
+    def update_ends(self):
+        """ Compute the time after which each universe no longer changes """
+        self.ends = {universe: -math.inf for universe in self.frames}
+        for node in self.nodes:
+            for step in node.steps:
+                for group in step.groups:
+                    end = animation_end(self.animations[group][1])
+                    self.ends[node.universe] = max(self.ends[node.universe], end)
+        for batch in self.batches:
+            self.ends[batch.universe] = max(self.ends[batch.universe], batch.end())
+        self._settled.clear()
+
+    def compute(self, t):
+        """ Compute the frames at time t and return them as a dict() of bytearrays, indexed by address - 1
+            The frame of a universe whose animations ended is only computed once
+        """
+        frames = self.frames
+        live = self._live
+        settled = self._settled
+        for universe, frame in frames.items():
+            if t > self.ends[universe]:
+                if universe in settled:
+                    live[universe] = False
+                    continue
+                settled.add(universe)
+            else:
+                settled.discard(universe)
+            live[universe] = True
+            frame[:] = self.base[universe]
+        for batch in self.batches:
+            if live[batch.universe]:
+                batch.compute(t)
+        styles = self._styles
+        computed = self._computed
+        self._frame += 1
+        current = self._frame
+        for node in self.nodes:
+            if not live[node.universe]:
+                continue
+            frame = frames[node.universe]
+            offset = node.address - 1
+            for step in node.steps:
+                group = None
+                for g in step.groups:
+                    if computed[g] != current:
+                        computed[g] = current
+                        compute_animation(self.animations[g][1], self._timelines[g], t, styles[g], self._values[g])
+                    if step.property in styles[g]:
+                        group = g
+                if group is None:
+                    if step.pairs is not None:
+                        write_pairs(frame, step.pairs)
+                    continue
+                step.mapper.write(styles[group][step.property], frame, offset)
+        return frames
+
+
+def compile_entry(node, device, keyframes, mappers=None):
+    """ Compile the channels of a styled device node into an Entry
+        mappers is the compiled device (see lib.mapper.compile_device), compiled from device when not given
+    """
+    if mappers is None:
+        mappers = compile_device(device)
+    before, after = [], []
+    animated = False
+    for prop in node.style:
+        if prop == 'animation':
+            animated = True
+        elif prop in mappers:
+            (after if animated else before).append(prop)
+    pairs = {}
+    for prop in before + after:
+        pairs[prop] = mappers[prop].pairs(node.style[prop], node.address)
+    # static properties declared after the animation always override it
+    animations = {}
+    for name, anim in node.style.get('animation', {}).items():
+        if name not in keyframes:
+            logger.warning("unknown keyframes {}".format(name))
+            continue
+        for frame in keyframes[name].frames:
+            for decl in frame.declarations:
+                prop = decl.property
+                if prop in mappers and prop not in after:
+                    props_animations = animations.setdefault(prop, [])
+                    if (name, anim) not in props_animations:
+                        props_animations.append((name, anim))
+    steps = []
+    if animations:
+        order = before + [prop for prop in animations if prop not in before] + after
+        steps = [EntryStep(property=prop, pairs=pairs.get(prop), animations=tuple(animations.get(prop, ())),
+                           mapper=mappers[prop])
+                 for prop in order]
+    return Entry(tag=node.tag, device=device, universe=node.universe, address=node.address,
+                 static=list(pairs.values()), steps=steps)
+
+
+def compile_plan(tree, devices, keyframes, *, previous=None, changed=None,
+                 vectorize=None, min_batch_size=vectorized.MIN_BATCH_SIZE):
+    """ Compile a styled tree (see apply_style_on_dom) into a Plan
+        When previous is a plan compiled from the same tree, only the changed nodes are compiled again
+        The NumPy backend is used for large groups of nodes when vectorize is True,
+        or when numpy is installed if vectorize is None
+    """
+    plan = Plan(keyframes)
+    entries = previous.entries if previous is not None else {}
+    if previous is not None:
+        plan.mappers.update(previous.mappers)
+    changed = {id(node) for node in changed} if changed is not None else None
+    reused = 0
+    for node in tree.walk():
+        if node.tag in devices:
+            entry = entries.get(id(node)) if changed is not None and id(node) not in changed else None
+            if entry is not None:
+                reused += 1
+            else:
+                device = devices[node.tag]
+                if node.tag not in plan.mappers:
+                    plan.mappers[node.tag] = compile_device(device)
+                entry = compile_entry(node, device, keyframes, plan.mappers[node.tag])
+            plan.add_entry(id(node), entry)
+    # hit rate of the incremental compilation
+    stats.count('entries reused', reused)
+    stats.count('entries compiled', len(plan.entries) - reused)
+    if vectorize is None:
+        vectorize = vectorized.available()
+    if vectorize:
+        if not vectorized.available():
+            raise Exception("The vectorized backend requires numpy")
+        vectorized.vectorize(plan, min_batch_size)
+    plan.update_ends()
+    return plan
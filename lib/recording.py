@@ -0,0 +1,224 @@
+""" DMX recordings: shows rendered offline and played back without computing them
+
+A recording is a header, the frame records, an index of the frame records and a footer:
+
+    header   magic, version, flags, fps, frame count, keyframe interval, universe count, universes
+    records  kind (full or delta), payload size, payload
+    index    offset of each frame record
+    footer   offset of the index, magic
+
+A full record holds the channels of all universes, one after another. A delta record holds
+the runs of channels that changed since the previous frame, as (start, length, values).
+A full record is written every keyframe interval so that playback can seek without
+replaying the whole show. Payloads are optionally compressed with zlib, uncompressed
+recordings are read directly from a memory map.
+"""
+from array import array
+import mmap
+import os
+import struct
+import zlib
+
+from .plan import DMX_CHANNELS
+
+MAGIC = b'DMXR'
+VERSION = 1
+COMPRESSED = 0x1
+
+FULL = 0
+DELTA = 1
+
+HEADER = struct.Struct('<4sHHdIIH')
+UNIVERSE = struct.Struct('<H')
+RECORD = struct.Struct('<BI')
+RUN = struct.Struct('<IH')
+FOOTER = struct.Struct('<Q4s')
+
+# runs separated by fewer unchanged channels than a run header are merged
+MIN_GAP = RUN.size
+# channels compared at once when looking for changes
+BLOCK = 32
+
+
+def diff_runs(previous, current):
+    """ Return the (start, end) runs of the channels that differ between two buffers of the same size """
+    runs = []
+    for block in range(0, len(current), BLOCK):
+        end = min(block + BLOCK, len(current))
+        if previous[block:end] == current[block:end]:
+            continue
+        for i in range(block, end):
+            if previous[i] == current[i]:
+                continue
+            if runs and i - runs[-1][1] < MIN_GAP:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+    return runs
+
+
+class RecordingWriter:
+    """ Write frames (dict() of bytearrays indexed by universe) to a recording file """
+    def __init__(self, filename, universes, fps=50, *, keyframe_interval=None, compress=False):
+        self.universes = sorted(universes)
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval or max(1, round(fps))
+        self.compress = compress
+        self.file = open(filename, 'wb')
+        self.offsets = array('Q')
+        self.previous = bytearray(DMX_CHANNELS * len(self.universes))
+        self.current = bytearray(DMX_CHANNELS * len(self.universes))
+        self.write_header()
+        for universe in self.universes:
+            self.file.write(UNIVERSE.pack(universe))
+
+    def write_header(self):
+        flags = COMPRESSED if self.compress else 0
+        self.file.write(HEADER.pack(MAGIC, VERSION, flags, self.fps, len(self.offsets),
+                                    self.keyframe_interval, len(self.universes)))
+
+    def write(self, frames):
+        view = memoryview(self.current)
+        for i, universe in enumerate(self.universes):
+            view[i * DMX_CHANNELS:(i + 1) * DMX_CHANNELS] = frames[universe]
+        if len(self.offsets) % self.keyframe_interval == 0:
+            kind, payload = FULL, bytes(self.current)
+        else:
+            kind = DELTA
+            payload = b''.join(RUN.pack(start, end - start) + self.current[start:end]
+                               for start, end in diff_runs(self.previous, self.current))
+        if self.compress:
+            payload = zlib.compress(payload)
+        self.offsets.append(self.file.tell())
+        self.file.write(RECORD.pack(kind, len(payload)))
+        self.file.write(payload)
+        self.previous, self.current = self.current, self.previous
+
+    def close(self):
+        index = self.file.tell()
+        self.file.write(self.offsets.tobytes())
+        self.file.write(FOOTER.pack(index, MAGIC))
+        # the frame count is only known at the end
+        self.file.seek(0)
+        self.write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def render(plan, filename, duration, fps=50, *, start=0, keyframe_interval=None, compress=False):
+    """ Compute duration seconds of a plan from show time start, as fast as possible, into a recording
+        Return the number of frames written
+    """
+    count = round(duration * fps)
+    with RecordingWriter(filename, plan.frames, fps, keyframe_interval=keyframe_interval,
+                         compress=compress) as writer:
+        for i in range(count):
+            writer.write(plan.compute(start + i / fps))
+    return count
+
+
+class Recording:
+    """ A recording file, memory mapped """
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size + FOOTER.size:
+                raise Exception("Expected a DMX recording, got {}".format(filename))
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, self.fps, count, self.keyframe_interval, universes = HEADER.unpack_from(self.mmap)
+        index, footer = FOOTER.unpack_from(self.mmap, len(self.mmap) - FOOTER.size)
+        if magic != MAGIC or footer != MAGIC:
+            self.mmap.close()
+            raise Exception("Expected a DMX recording, got {}".format(filename))
+        if version != VERSION:
+            self.mmap.close()
+            raise Exception("Expected a DMX recording version {}, got {}".format(VERSION, version))
+        data = memoryview(self.mmap)
+        self.compressed = bool(flags & COMPRESSED)
+        self.universes = [UNIVERSE.unpack_from(data, HEADER.size + i * UNIVERSE.size)[0] for i in range(universes)]
+        self.offsets = data[index:index + count * 8].cast('Q')
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def duration(self):
+        return len(self) / self.fps
+
+    def apply(self, i, buffer):
+        """ Apply frame record i to buffer, which holds frame i - 1 unless i is a keyframe """
+        offset = self.offsets[i]
+        kind, size = RECORD.unpack_from(self.data, offset)
+        payload = self.data[offset + RECORD.size:offset + RECORD.size + size]
+        if self.compressed:
+            payload = memoryview(zlib.decompress(payload))
+        if kind == FULL:
+            buffer[:] = payload
+            return
+        position = 0
+        while position < len(payload):
+            start, length = RUN.unpack_from(payload, position)
+            position += RUN.size
+            buffer[start:start + length] = payload[position:position + length]
+            position += length
+
+    def close(self):
+        self.offsets.release()
+        self.data.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Player:
+    """ Replay a recording with the interface of a Plan: compute(t) returns the frames at time t
+
+        Playback starts at the cue `start` (in seconds of the recording) and runs `speed` times
+        faster than recorded, a negative speed plays backwards. Past either end, the recording
+        starts over when `loop` is set and holds its first or last frame otherwise.
+        Consecutive frames only apply their changes to the current frames, other frames are
+        decoded from the previous keyframe.
+    """
+    def __init__(self, recording, *, start=0, speed=1, loop=False):
+        self.recording = recording
+        self.start = start
+        self.speed = speed
+        self.loop = loop
+        self.buffer = bytearray(DMX_CHANNELS * len(recording.universes))
+        view = memoryview(self.buffer)
+        # frames share the memory of the buffer
+        self.frames = {universe: view[i * DMX_CHANNELS:(i + 1) * DMX_CHANNELS]
+                       for i, universe in enumerate(recording.universes)}
+        self.position = -1
+
+    def seek(self, i):
+        """ Decode frame i into the frames """
+        keyframe = i - i % self.recording.keyframe_interval
+        first = self.position + 1 if keyframe <= self.position < i else keyframe
+        for j in range(first, i + 1):
+            self.recording.apply(j, self.buffer)
+        self.position = i
+
+    def frame_at(self, t):
+        """ Return the index of the frame played at time t """
+        count = len(self.recording)
+        i = round((self.start + t * self.speed) * self.recording.fps)
+        if self.loop:
+            return i % count
+        return min(max(i, 0), count - 1)
+
+    def compute(self, t):
+        if len(self.recording):
+            i = self.frame_at(t)
+            if i != self.position:
+                self.seek(i)
+        return self.frames
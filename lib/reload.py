@@ -0,0 +1,99 @@
+from threading import Event, Lock, Thread
+from time import perf_counter_ns
+import os
+import traceback
+
+from . import stats
+from .css import parse_css_file
+from .plan import compile_plan
+from .style import StyleMap
+from .tree import parse_tree_file
+
+
+def file_signature(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ShowWatcher(Thread):
+    """ Poll tree.xml and style.css and compile a new plan in the background when they change
+
+        Only the changed file is parsed again. When only the stylesheet changed, only the
+        nodes affected by the changed rules and keyframes are restyled and compiled again
+        (see StyleMap), reusing the rest of the current plan. The new plan is picked up with take(),
+        typically between two frames, so that the output never stops. When a file
+        cannot be parsed, the error is printed and the current show keeps running.
+    """
+    def __init__(self, tree_file, css_file, devices, tree, css, *, interval=0.5):
+        super().__init__(name='watcher', daemon=True)
+        self.tree_file = tree_file
+        self.css_file = css_file
+        self.devices = devices
+        self.tree = tree
+        self.css = css
+        # plan currently running, set before starting the watcher
+        self.plan = None
+        self.styles = None
+        self.interval = interval
+        self.signatures = {f: file_signature(f) for f in [tree_file, css_file]}
+        self._pending = None
+        self._lock = Lock()
+        self._stopped = Event()
+
+    def changed(self, filename):
+        signature = file_signature(filename)
+        if signature is None or signature == self.signatures[filename]:
+            return False
+        self.signatures[filename] = signature
+        return True
+
+    def check(self):
+        """ Reload the changed files, return True when a new plan is available """
+        tree_changed = self.changed(self.tree_file)
+        css_changed = self.changed(self.css_file)
+        if not tree_changed and not css_changed:
+            return False
+        try:
+            start = perf_counter_ns()
+            css = parse_css_file(self.css_file) if css_changed else self.css
+            tree = parse_tree_file(self.tree_file) if tree_changed else self.tree
+            parsed = perf_counter_ns()
+            if tree_changed:
+                styles = StyleMap(tree, css)
+                styled = perf_counter_ns()
+                plan = compile_plan(tree, self.devices, css.keyframes)
+            else:
+                styles = self.styles or StyleMap(tree, self.css)
+                changed = styles.update(css)
+                styled = perf_counter_ns()
+                plan = compile_plan(tree, self.devices, css.keyframes, previous=self.plan, changed=changed)
+            stats.record('parse', parsed - start)
+            stats.record('style', styled - parsed)
+            stats.record('compile', perf_counter_ns() - styled)
+        except Exception:
+            traceback.print_exc()
+            # styles may be partially updated, style everything again on the next change
+            self.styles = None
+            return False
+        self.tree, self.css, self.styles, self.plan = tree, css, styles, plan
+        with self._lock:
+            self._pending = plan
+        print("reloaded {}".format(", ".join(f for f, c in [(self.tree_file, tree_changed),
+                                                           (self.css_file, css_changed)] if c)))
+        return True
+
+    def take(self):
+        """ Return the last compiled plan if it has not been taken yet, None otherwise """
+        with self._lock:
+            plan, self._pending = self._pending, None
+        return plan
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
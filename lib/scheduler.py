@@ -0,0 +1,98 @@
+from time import perf_counter_ns, sleep
+import math
+
+POLICIES = ['skip', 'catchup']
+
+
+class SchedulerStats:
+    """ Running statistics of the ticks of a FrameScheduler, times are in nanoseconds """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.first = None
+        self.last = None
+        # Welford's online algorithm for the lateness mean and variance
+        self.mean = 0
+        self.m2 = 0
+        self.max = 0
+
+    def record(self, late, now):
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.ticks += 1
+        delta = late - self.mean
+        self.mean += delta / self.ticks
+        self.m2 += delta * (late - self.mean)
+        self.max = max(self.max, late)
+
+    @property
+    def jitter(self):
+        """ Standard deviation of the lateness of the ticks """
+        return math.sqrt(self.m2 / self.ticks) if self.ticks > 1 else 0
+
+    @property
+    def fps(self):
+        if self.ticks < 2 or self.last == self.first:
+            return 0
+        return (self.ticks - 1) * 1e9 / (self.last - self.first)
+
+    def to_dict(self):
+        return {'fps': self.fps, 'late_avg_ms': self.mean / 1e6, 'late_max_ms': self.max / 1e6,
+                'jitter_ms': self.jitter / 1e6, 'overruns': self.overruns, 'skipped': self.skipped}
+
+    def __str__(self):
+        return "fps {:.2f} late avg {:.3f}ms max {:.3f}ms jitter {:.3f}ms overruns {} skipped {}".format(
+            self.fps, self.mean / 1e6, self.max / 1e6, self.jitter / 1e6, self.overruns, self.skipped)
+
+
+class FrameScheduler:
+    """ Iterate over the show time in seconds at a fixed frame rate
+
+        Ticks are computed from the start time and the monotonic performance counter,
+        so they do not drift and do not jump with wall-clock adjustments.
+        The scheduler sleeps until `spin` seconds before the tick and busy waits the rest.
+        When a tick is late by more than a frame, the 'skip' policy drops the missed ticks
+        while the 'catchup' policy yields them as fast as possible.
+    """
+    def __init__(self, fps=50, *, spin=0.001, policy='skip', clock=perf_counter_ns, sleep=sleep):
+        if policy not in POLICIES:
+            raise Exception("Expected scheduler policy in {}, got '{}'".format(POLICIES, policy))
+        self.interval = round(1e9 / fps)
+        self.spin = round(spin * 1e9)
+        self.policy = policy
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = SchedulerStats()
+
+    def wait(self, target):
+        remaining = target - self.clock()
+        if remaining > self.spin:
+            self.sleep((remaining - self.spin) / 1e9)
+        while self.clock() < target:
+            pass
+
+    def __iter__(self):
+        interval = self.interval
+        start = self.clock()
+        tick = 0
+        while True:
+            target = start + tick * interval
+            self.wait(target)
+            now = self.clock()
+            late = now - target
+            if late >= interval:
+                self.stats.overruns += 1
+                if self.policy == 'skip':
+                    missed = late // interval
+                    self.stats.skipped += missed
+                    tick += missed
+                    target += missed * interval
+                    late = now - target
+            self.stats.record(late, now)
+            yield (target - start) / 1e9
+            tick += 1
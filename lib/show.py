@@ -0,0 +1,90 @@
+from collections import namedtuple
+from logging import getLogger
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from time import perf_counter_ns
+
+from . import __version__, stats, vectorized
+from .core import apply_style_on_dom
+from .css import parse_css_file
+from .hardware import DeviceLibrary
+from .plan import compile_plan
+from .tree import parse_tree_file
+
+logger = getLogger(__name__)
+
+# bump when the layout of the pickled objects changes
+CACHE_FORMAT = 5
+
+# a parsed, styled and compiled project
+Show = namedtuple('Show', ['devices', 'tree', 'css', 'plan'])
+
+
+def build_show(tree_file, css_file, device_paths=None):
+    """ Parse, style and compile a project, only the devices used by the tree are loaded """
+    devices = DeviceLibrary(device_paths)
+    start = perf_counter_ns()
+    tree = parse_tree_file(tree_file)
+    css = parse_css_file(css_file)
+    parsed = perf_counter_ns()
+    apply_style_on_dom(tree, css)
+    styled = perf_counter_ns()
+    plan = compile_plan(tree, devices, css.keyframes)
+    stats.record('parse', parsed - start)
+    stats.record('style', styled - parsed)
+    stats.record('compile', perf_counter_ns() - styled)
+    return Show(devices=devices, tree=tree, css=css, plan=plan)
+
+
+def show_key(tree_file, css_file, device_paths=None):
+    """ Return a hash of everything a compiled show depends on """
+    h = hashlib.sha256()
+    # the plan layout depends on the version, the pickle format on python and the batches on numpy
+    h.update("{} {} {} {}".format(__version__, CACHE_FORMAT, sys.version_info[:2], vectorized.available()).encode())
+    for filename in [tree_file, css_file]:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        h.update("{} {}\n".format(os.path.basename(filename), len(data)).encode())
+        h.update(data)
+    # device libraries can be large, their files are identified by their metadata instead of their content
+    for filename in DeviceLibrary(device_paths).files():
+        stat = os.stat(filename)
+        h.update("{} {} {}\n".format(os.path.abspath(filename), stat.st_size, stat.st_mtime_ns).encode())
+    return h.hexdigest()
+
+
+def load_show(tree_file, css_file, cache_dir=None, device_paths=None):
+    """ Build a Show, or load it from cache_dir when the inputs did not change since it was stored
+        Only use a cache directory you trust, the cache is stored with pickle
+    """
+    if cache_dir is None:
+        return build_show(tree_file, css_file, device_paths)
+    filename = os.path.join(cache_dir, show_key(tree_file, css_file, device_paths) + ".pickle")
+    try:
+        with open(filename, 'rb') as f:
+            show = pickle.load(f)
+        if not isinstance(show, Show):
+            raise TypeError("expected a Show, got {}".format(type(show).__name__))
+        stats.count('show cache hits')
+        return show
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # a corrupt or stale cache is rebuilt, whatever unpickling it raises
+        logger.warning("ignoring show cache {}: {!r}".format(filename, e))
+    stats.count('show cache misses')
+    show = build_show(tree_file, css_file, device_paths)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write then rename, so that a crash never leaves a truncated cache behind
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(show, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return show
@@ -0,0 +1,140 @@
+""" Performance counters: timing histograms of each stage of a show, counters and gauges
+
+The module holds a single registry, fed from anywhere with record() and count():
+
+    start = perf_counter_ns()
+    frames = plan.compute(t)
+    stats.record('compute', perf_counter_ns() - start)
+
+Recording costs a few hundred nanoseconds, so stages are timed on every frame.
+The counters can be read with snapshot(), printed with summary() or served as JSON
+over HTTP with serve().
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import perf_counter_ns
+import json
+
+# durations are bucketed by their number of bits in nanoseconds, bucket i holds [2^(i - 1), 2^i)
+BUCKETS = 48
+
+
+class Histogram:
+    """ Distribution of durations in nanoseconds, in power of 2 buckets """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, duration):
+        self.buckets[min(duration.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def percentile(self, p):
+        """ Return an upper bound of the p-th percentile (0 < p <= 100) """
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(2 ** i, self.max)
+        return 0
+
+    def to_dict(self):
+        return {'count': self.count, 'mean_ms': self.mean / 1e6, 'p50_ms': self.percentile(50) / 1e6,
+                'p99_ms': self.percentile(99) / 1e6, 'max_ms': self.max / 1e6,
+                # upper bound of each bucket in nanoseconds
+                'buckets_ns': {str(2 ** i): n for i, n in enumerate(self.buckets) if n}}
+
+    def __str__(self):
+        return "avg {:.3f}ms p99 {:.3f}ms max {:.3f}ms".format(
+            self.mean / 1e6, self.percentile(99) / 1e6, self.max / 1e6)
+
+
+class Registry:
+    """ Histograms and counters by name, and gauges computed when read """
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = perf_counter_ns()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name, duration):
+        self.histogram(name).record(duration)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, function):
+        """ Register function, called to read the gauge `name` """
+        self.gauges[name] = function
+
+    def reset(self):
+        """ Reset the histograms, counters and gauges keep counting """
+        for histogram in list(self.histograms.values()):
+            histogram.reset()
+
+    def snapshot(self):
+        return {'uptime_s': (perf_counter_ns() - self.started) / 1e9,
+                'stages': {name: h.to_dict() for name, h in list(self.histograms.items())},
+                'counters': dict(self.counters),
+                'gauges': {name: function() for name, function in list(self.gauges.items())}}
+
+    def summary(self):
+        """ Return a single line with the timing of each stage that ran and the counters """
+        stages = ["{} {}".format(name, h) for name, h in list(self.histograms.items()) if h.count]
+        counters = ["{} {}".format(name, n) for name, n in sorted(self.counters.items())]
+        return " | ".join(stages + counters)
+
+
+registry = Registry()
+record = registry.record
+count = registry.count
+gauge = registry.gauge
+reset = registry.reset
+snapshot = registry.snapshot
+summary = registry.summary
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ['/', '/stats']:
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.registry.snapshot(), indent=2).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1', stats=registry):
+    """ Serve the snapshot of stats as JSON on http://host:port/stats from a background thread
+        Return the server, call shutdown() on it to stop serving
+    """
+    server = ThreadingHTTPServer((host, port), StatsHandler)
+    server.daemon_threads = True
+    server.registry = stats
+    Thread(target=server.serve_forever, name='stats', daemon=True).start()
+    return server
@@ -0,0 +1,71 @@
+from difflib import SequenceMatcher
+
+
+class StyleMap:
+    """ Style a tree and remember which rules match which nodes
+
+        When the stylesheet changes, update() only restyles the nodes matched by the
+        rules that changed (and their descendants, which inherit their style).
+        The resulting styles are the same as with apply_style_on_dom.
+    """
+    def __init__(self, tree, css):
+        self.tree = tree
+        self.css = css
+        self.matches = self.match(css.rules)
+        for node in tree.walk():
+            self.style_node(node)
+
+    def match(self, rules):
+        """ Return the (rule index, selector index) pairs matching each node, by node id """
+        matches = {}
+        for i, rule in enumerate(rules):
+            for j, selector in enumerate(rule.selectors):
+                for node in self.tree.select(selector):
+                    matches.setdefault(id(node), []).append((i, j))
+        return matches
+
+    def style_node(self, node):
+        # apply_style_on_dom pushes each declaration from the matched node to its descendants,
+        # ordered by rule, selector and then from the outermost ancestor to the node itself
+        ancestors = []
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        contributions = []
+        for depth, ancestor in enumerate(reversed(ancestors)):
+            for i, j in self.matches.get(id(ancestor), ()):
+                contributions.append((i, j, depth))
+        contributions.sort()
+        style = {}
+        for i, _, _ in contributions:
+            for decl in self.css.rules[i].declarations:
+                style[decl.property] = decl.value
+        ancestors[0].style = style
+
+    def update(self, css):
+        """ Restyle the nodes affected by the differences between the current stylesheet and css
+            Return the nodes whose style or animations changed
+        """
+        old_rules, new_rules = self.css.rules, css.rules
+        old_keyframes, new_keyframes = self.css.keyframes, css.keyframes
+        matcher = SequenceMatcher(None, [repr(r) for r in old_rules], [repr(r) for r in new_rules], autojunk=False)
+        affected = {}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            for rule in old_rules[i1:i2] + new_rules[j1:j2]:
+                for selector in rule.selectors:
+                    for node in self.tree.select(selector):
+                        for n in node.walk():
+                            affected[id(n)] = n
+        self.css = css
+        self.matches = self.match(new_rules)
+        for node in affected.values():
+            self.style_node(node)
+        changed = {name for name in set(old_keyframes) | set(new_keyframes)
+                   if old_keyframes.get(name) != new_keyframes.get(name)}
+        if changed:
+            for node in self.tree.walk():
+                if any(name in changed for name in node.style.get('animation', {})):
+                    affected[id(node)] = node
+        return list(affected.values())
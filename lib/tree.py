@@ -1,14 +1,62 @@
 from xml.etree import ElementTree as ET
 
 
+class Index:
+    """ id, class and tag indexes of a tree, nodes are kept in insertion order """
+    def __init__(self, root=None):
+        self.nodes = {'id': {}, 'class': {}, 'tag': {}}
+        if root is not None:
+            self.add(root)
+
+    @staticmethod
+    def keys(node):
+        if node.id:
+            yield 'id', node.id
+        for klass in set(node.klass):
+            if klass:
+                yield 'class', klass
+        yield 'tag', node.tag
+
+    def add(self, node):
+        for n in node.walk():
+            for typ, value in self.keys(n):
+                self.nodes[typ].setdefault(value, {})[id(n)] = n
+
+    def remove(self, node):
+        for n in node.walk():
+            for typ, value in self.keys(n):
+                nodes = self.nodes[typ][value]
+                del nodes[id(n)]
+                if not nodes:
+                    del self.nodes[typ][value]
+
+    def select(self, selector):
+        return self.nodes[selector.type].get(selector.value, {}).values()
+
+    # nodes are indexed by id(), which does not survive pickling
+    def __getstate__(self):
+        return {typ: {value: list(nodes.values()) for value, nodes in index.items()}
+                for typ, index in self.nodes.items()}
+
+    def __setstate__(self, state):
+        self.nodes = {typ: {value: {id(n): n for n in nodes} for value, nodes in index.items()}
+                      for typ, index in state.items()}
+
+
 class Node:
-    def __init__(self, tag, *, address, id, klass, children):
+    def __init__(self, tag, *, address, id, klass, children, universe=1):
         self.tag = tag
         self.address = address
+        self.universe = universe
         self.id = id
         self.klass = klass.split(" ")
         self.children = children
         self.style = {}
+        self.parent = None
+        # only set on the root of a tree, see parse_tree_file
+        self.index = None
+        for child in children:
+            child.parent = self
 
     def add_style(self, prop, value):
         self.style[prop] = value
@@ -20,13 +68,40 @@ class Node:
         for child in self:
             yield from child.walk()
 
+    def root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def contains(self, node):
+        while node is not None:
+            if node is self:
+                return True
+            node = node.parent
+        return False
+
+    def append(self, child):
+        child.parent = self
+        child.index = None
+        self.children.append(child)
+        index = self.root().index
+        if index is not None:
+            index.add(child)
+
+    def remove(self, child):
+        index = self.root().index
+        if index is not None:
+            index.remove(child)
+        self.children.remove(child)
+        child.parent = None
+
     def select(self, selector):
-        for node in self.walk():
-            if selector.type == 'id' and selector.value == node.id:
-                yield node
-            elif selector.type == 'class' and selector.value in node.klass:
-                yield node
-            elif selector.type == 'tag' and selector.value == node.tag:
+        root = self.root()
+        if root.index is None:
+            root.index = Index(root)
+        for node in root.index.select(selector):
+            if self is root or self.contains(node):
                 yield node
 
     def __iter__(self):
@@ -47,16 +122,20 @@ class Node:
             child.print(level + 1)
 
 
-def parse_node(node):
-    children = [parse_node(child) for child in node]
+def parse_node(node, universe=1):
+    # the universe is inherited by children so that a whole group can be moved at once
+    universe = int(node.attrib.get('universe', universe))
+    children = [parse_node(child, universe) for child in node]
     return Node(node.tag,
                 address=int(node.attrib.get('address', 1)),
                 id=node.attrib.get('id', ''),
                 klass=node.attrib.get('class', ''),
-                children=children)
+                children=children,
+                universe=universe)
 
 
 def parse_tree_file(filename):
     tree = ET.parse(filename)
-    root = tree.getroot()
-    return parse_node(root)
+    root = parse_node(tree.getroot())
+    root.index = Index(root)
+    return root
@@ -1,83 +1,68 @@
-from datetime import datetime
-from time import sleep
-import math
+from array import array
+from functools import lru_cache
 
-
-def trange(start=None, end=None, interval=1):
-    now = datetime.now().timestamp()
-    if start is None:
-        start = now
-    else:
-        start = start.timestamp()
-    if end is not None:
-        end = end.timestamp()
-    if start > now:
-        sleep(start - now)
-    now = start
-    i = 1
-    while end is None or now < end:
-        yield datetime.now()
-        now = datetime.now().timestamp()
-        target = start + i * interval
-        if target > now:
-            sleep(target - now)
-            now = target
-        i += 1
+# number of intervals of the easing lookup tables, the maximum error is O(1 / resolution ** 2)
+EASING_RESOLUTION = 1024
 
 
 def lerp(t, a, b):
     return t * b + (1 - t) * a
 
 
-def lerpP(t, zero, one):
-    return lerp(t, zero[0], one[0]), lerp(t, zero[1], one[1])
-
-
-def de_casteljau(t, coefs):
-    if len(coefs) == 1:
-        return coefs[0]
-    else:
-        return de_casteljau(t, [lerpP(t, x, y) for x, y in zip(coefs[:-1], coefs[1:])])
+def bezier_polynomial(c1, c2):
+    """ Return the polynomial coefficients of a 1D cubic bezier from (0, 0) to (1, 1) """
+    c = 3 * c1
+    b = 3 * (c2 - c1) - c
+    a = 1 - c - b
+    return a, b, c
 
 
-def compute_roots_cubic(a, b, c, d):
-    b /= a
-    c /= a
-    d /= a
-
-    p = (3 * c - b ** 2) / 3
-    q = (2 * b * b ** 2 - 9 * b * c + 27 * d) / 27
-
-    if p == 0:
-        return [math.pow(-q, 1 / 3)]
-    elif q == 0:
-        return [math.sqrt(-p), -math.sqrt(-p)]
-    else:
-        discriminant = math.pow(q / 2, 2) + math.pow(p / 3, 3)
-        if discriminant == 0:
-            return [math.pow(q / 2, 1 / 3) - b / 3]
-        elif discriminant > 0:
-            return [math.pow(-(q / 2) + math.sqrt(discriminant), 1 / 3) - math.pow((q / 2) + math.sqrt(discriminant), 1 / 3) - b / 3]
+def solve_bezier_x(coefs, x, epsilon=1e-12):
+    """ Return the curve parameter s such that x(s) = x, x(s) being monotonic on [0, 1] """
+    a, b, c = coefs
+    s = x
+    for _ in range(8):
+        error = ((a * s + b) * s + c) * s - x
+        if abs(error) < epsilon:
+            return s
+        slope = (3 * a * s + 2 * b) * s + c
+        if abs(slope) < 1e-6:
+            break
+        s -= error / slope
+    # newton did not converge, fall back to bisection
+    low, high = 0.0, 1.0
+    s = x
+    while high - low > epsilon:
+        error = ((a * s + b) * s + c) * s - x
+        if error > 0:
+            high = s
         else:
-            r = math.sqrt(math.pow(-(p / 3), 3))
-            phi = math.acos(-(q / (2 * math.sqrt(math.pow(-(p / 3), 3)))))
-            s = 2 * math.pow(r, 1 / 3)
-            return [
-                s * math.cos(phi / 3) - b / 3,
-                s * math.cos((phi + 2 * math.pi) / 3) - b / 3,
-                s * math.cos((phi + 4 * math.pi) / 3) - b / 3
-            ]
+            low = s
+        s = (low + high) / 2
+    return s
+
 
+@lru_cache(maxsize=64)
+def easing_table(p1, p2, resolution=EASING_RESOLUTION):
+    """ Sample the cubic bezier timing function defined by p1 and p2 at resolution + 1 evenly spaced x """
+    x_coefs = bezier_polynomial(p1[0], p2[0])
+    a, b, c = bezier_polynomial(p1[1], p2[1])
+    table = array('d')
+    for i in range(resolution + 1):
+        s = solve_bezier_x(x_coefs, i / resolution)
+        table.append(((a * s + b) * s + c) * s)
+    return table
 
-def compute_cubic_bezier(p1, p2, x0):
-    p0 = -x0
-    p1 -= x0
-    p2 -= x0
-    p3 = 1 - x0
 
-    a = p3 - 3 * p2 + 3 * p1 - p0
-    b = 3 * p2 - 6 * p1 + 3 * p0
-    c = 3 * p1 - 3 * p0
-    d = p0
-    roots = compute_roots_cubic(a, b, c, d)
-    return [r for r in roots if r >= 0 and r <= 1]
+def compute_easing(p1, p2, x, resolution=None):
+    """ Evaluate the cubic bezier timing function defined by p1 and p2 at x using a lookup table """
+    if resolution is None:
+        resolution = EASING_RESOLUTION
+    table = easing_table(p1, p2, resolution)
+    if x <= 0:
+        return table[0]
+    if x >= 1:
+        return table[resolution]
+    position = x * resolution
+    i = int(position)
+    return lerp(position - i, table[i], table[i + 1])
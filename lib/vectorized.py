@@ -0,0 +1,177 @@
+""" Optional NumPy backend for the frame plan
+
+Animated nodes sharing the same keyframes, timing function and device are batched
+together and computed in one vectorized pass, each node keeping its own duration,
+delay, iteration count and direction (e.g. chases built with growing delays).
+"""
+from . import utils
+from .css import get_timing_function_coefs
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIRECTION_CODES = {
+    'normal': 0,
+    'reverse': 1,
+    'alternate': 2,
+    'alternate-reverse': 3
+}
+
+# channels of each property in the order used by compute_dmx_* functions
+# each channel is (property descriptor, value attribute)
+VECTORIZED_PROPERTIES = {
+    'color': [('red', 'red'), ('green', 'green'), ('blue', 'blue'), ('white', 'white'), ('alpha', 'alpha')],
+    'strobe': [('speed', 'speed')],
+    'pulse': [('direction', 'direction'), ('speed', 'speed')],
+    'auto': [('name', 'name'), ('speed', 'speed')]
+}
+
+MIN_BATCH_SIZE = 16
+
+
+def available():
+    return np is not None
+
+
+class Channel:
+    """ One output channel of a batched property, resolved for every keyframe """
+    def __init__(self, chan, attr_desc, values):
+        self.chan = chan
+        self.enum = 'enum' in attr_desc
+        if self.enum:
+            self.values = np.array([attr_desc['enum'][v][0] if v is not None else 0 for v in values])
+        else:
+            self.values = np.array([v if v is not None else 0 for v in values], dtype=float)
+            self.low, self.high = attr_desc.get('range', [0, 255])
+
+    def compute(self, lower, higher, ratio):
+        if self.enum:
+            return self.values[lower]
+        src = self.values[lower]
+        css_value = np.trunc(src + (self.values[higher] - src) * ratio)
+        return np.trunc(self.low + (self.high - self.low) * css_value / 255)
+
+
+class Batch:
+    def __init__(self, universe, keyframe, function, device, props, nodes, anims):
+        self.universe = universe
+        self.out = None
+        p1, p2 = get_timing_function_coefs(function)
+        resolution = utils.EASING_RESOLUTION
+        self.easing = np.frombuffer(utils.easing_table(p1, p2, resolution))
+        self.easing_x = np.linspace(0, 1, resolution + 1)
+        self.selectors = np.array([f.selector / 100 for f in keyframe.frames])
+        self.addresses = np.array([node.address for node in nodes])
+        self.duration = np.array([anim.duration for anim in anims], dtype=float)
+        self.delay = np.array([anim.delay for anim in anims], dtype=float)
+        self.iteration = np.array([np.inf if anim.iteration == 'infinite' else anim.iteration for anim in anims],
+                                  dtype=float)
+        self.direction = np.array([DIRECTION_CODES[anim.direction] for anim in anims])
+        self.properties = []
+        for prop in props:
+            by_frame = [{d.property: d.value for d in f.declarations}.get(prop) for f in keyframe.frames]
+            present = np.array([v is not None for v in by_frame])
+            channels = []
+            for desc, attr in VECTORIZED_PROPERTIES[prop]:
+                if desc in device[prop]:
+                    values = [getattr(v, attr) if v is not None else None for v in by_frame]
+                    channels.append(Channel(device[prop][desc]['chan'], device[prop][desc], values))
+            self.properties.append((present, channels))
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['out'] = None
+        return state
+
+    def end(self):
+        """ Return the time after which the batch no longer changes, see plan.animation_end """
+        ends = np.where((self.direction == DIRECTION_CODES['normal']) & np.isfinite(self.iteration),
+                        self.delay + self.duration * self.iteration, np.inf)
+        return float(ends.max())
+
+    def bind(self, frames):
+        """ Write into the universe buffer of frames """
+        self.out = np.frombuffer(frames[self.universe], dtype=np.uint8)
+
+    def compute(self, t):
+        """ Write the channels of all nodes of the batch at time t into the universe buffer """
+        out = self.out
+        duration = self.duration
+        anim_t = t - self.delay
+        started = anim_t >= 0
+        position = (anim_t % (duration * 2)) / duration
+        direction = self.direction
+        reverse = (direction == 1) | ((direction == 2) & (position > 1)) | ((direction == 3) & (position <= 1))
+        anim_t = np.where(reverse, duration - (anim_t % duration), anim_t)
+        on = started & (anim_t <= duration * self.iteration)
+        percent_t = (anim_t % duration) / duration
+        selectors = self.selectors
+        higher = np.searchsorted(selectors, percent_t, side='right')
+        on &= (higher > 0) & (higher < len(selectors))
+        higher = np.clip(higher, 1, len(selectors) - 1)
+        lower = higher - 1
+        x0 = (percent_t - selectors[lower]) / (selectors[higher] - selectors[lower])
+        ratio = np.interp(x0, self.easing_x, self.easing)
+        for present, channels in self.properties:
+            mask = on & present[lower] & present[higher]
+            for channel in channels:
+                # remove 2 because both address and channel number start at 1
+                index = self.addresses + (channel.chan - 2)
+                write = mask & (index >= 0) & (index < len(out))
+                out[index[write]] = channel.compute(lower, higher, ratio)[write]
+
+
+def batch_key(node, name, anim):
+    function = anim.function
+    return (name, function.name, tuple(function.params), node.tag, node.universe,
+            tuple(step.property for step in node.steps))
+
+
+def is_vectorizable(plan, node):
+    groups = {step.groups for step in node.steps}
+    if len(groups) != 1 or len(next(iter(groups))) != 1:
+        return False
+    group = next(iter(groups))[0]
+    name, anim = plan.animations[group]
+    for step in node.steps:
+        if step.property not in VECTORIZED_PROPERTIES:
+            return False
+        if step.property == 'color' and not all(c in node.device['color'] for c in ['red', 'green', 'blue']):
+            return False
+        for frame in plan.keyframes[name].frames:
+            for decl in frame.declarations:
+                # named colors are not interpolated
+                if decl.property == 'color' and decl.value.name != '':
+                    return False
+    return anim.duration > 0
+
+
+def vectorize(plan, min_batch_size=MIN_BATCH_SIZE):
+    """ Move the animated nodes of a plan that can be batched into vectorized batches """
+    candidates = {}
+    for node in plan.nodes:
+        if is_vectorizable(plan, node):
+            name, anim = plan.animations[node.steps[0].groups[0]]
+            candidates.setdefault(batch_key(node, name, anim), []).append((node, anim))
+    batched = set()
+    for (name, *_), members in candidates.items():
+        if len(members) < min_batch_size:
+            continue
+        nodes = [node for node, _ in members]
+        anims = [anim for _, anim in members]
+        node = nodes[0]
+        try:
+            batch = Batch(node.universe, plan.keyframes[name], anims[0].function, node.device,
+                          [step.property for step in node.steps], nodes, anims)
+            batch.bind(plan.frames)
+        except KeyError:
+            # unknown enum values are left to the python path, which reports them
+            continue
+        plan.batches.append(batch)
+        batched.update(id(n) for n in nodes)
+    plan.nodes = [node for node in plan.nodes if id(node) not in batched]
@@ -1,7 +1,12 @@
+import os
+
 import pytest
 import tinycss2
 
-from lib.css import parse_animation, parse_keyframes
+from lib.core import apply_style_on_dom
+from lib.css import parse_animation, parse_keyframes, parse_css_file
+from lib.hardware import load_devices
+from lib.tree import parse_tree_file
 
 
 @pytest.fixture
@@ -79,3 +84,26 @@ def animation_alternate():
 @pytest.fixture
 def animation_alternate_reverse():
     return parse_animation("redintensity 5s ease 0s infinite alternate-reverse")
+
+
+@pytest.fixture
+def devices():
+    return load_devices()
+
+
+def load_example(name):
+    tree = parse_tree_file(os.path.join("examples", name, "tree.xml"))
+    css = parse_css_file(os.path.join("examples", name, "style.css"))
+    apply_style_on_dom(tree, css)
+    return tree, css
+
+
+def load_project(tmpdir, tree, style="", styled=True):
+    """ Write tree.xml and style.css into tmpdir and return the parsed tree, styled unless styled is False, and css """
+    tmpdir.join("tree.xml").write(tree)
+    tmpdir.join("style.css").write(style)
+    tree = parse_tree_file(str(tmpdir.join("tree.xml")))
+    css = parse_css_file(str(tmpdir.join("style.css")))
+    if styled:
+        apply_style_on_dom(tree, css)
+    return tree, css
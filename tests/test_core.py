@@ -1,5 +1,5 @@
-from lib.core import compute_animations
-from lib.css import Color
+from lib.core import Timeline, compute_animation, compute_animations
+from lib.css import Color, parse_stylesheet
 
 from .fixtures import *  # NOQA
 
@@ -41,3 +41,41 @@ def test_compute_animations_alternate_reverse(keyframe_simple_parsed, animation_
     assert(compute_animations(animation_alternate_reverse, keyframe_simple_parsed, 9.99) == {'color': Color(255, 0, 0, alpha=0)})
     assert(compute_animations(animation_alternate_reverse, keyframe_simple_parsed, 10.01) == {'color': Color(255, 0, 0, alpha=0)})
     assert(compute_animations(animation_alternate_reverse, keyframe_simple_parsed, 14.99) == {'color': Color(255, 0, 0, alpha=254)})
+
+
+def test_compute_animation_in_place(keyframe_simple_parsed, animation_simple):
+    anim, keyframe = animation_simple['redintensity'], Timeline(keyframe_simple_parsed['redintensity'])
+    style, values = {}, {}
+    assert(compute_animation(anim, keyframe, 0.01, style, values) is style)
+    color = style['color']
+    assert(values == {'color': color})
+    assert(compute_animation(anim, keyframe, 2.50, style, values) == {'color': Color(255, 0, 0, alpha=50)})
+    assert(style['color'] is color)
+
+
+def test_timeline_segments():
+    css = parse_stylesheet("""
+        @keyframes chase {
+            10% { color: rgb(0, 0, 0); strobe: 0; }
+            30% { color: rgb(255, 0, 0); }
+            30% { color: rgb(0, 255, 0); }
+            60% { color: rgb(0, 0, 255); strobe: 1; }
+            80% { strobe: 0.5; }
+        }
+    """)
+    timeline = Timeline(css.keyframes['chase'])
+    assert([timeline.find(t) for t in [0, 0.1, 0.29, 0.3, 0.59, 0.6, 0.79, 0.8, 0.99]] == [-1, 0, 0, 2, 2, 3, 3, -1, -1])
+    # only the properties declared by both frames of a segment are animated
+    assert([prop for prop, _, _ in timeline.segments[0]] == ['color'])
+    assert([prop for prop, _, _ in timeline.segments[3]] == ['strobe'])
+    # consecutive lookups do not depend on the previous one
+    assert([timeline.find(t) for t in [0.7, 0.15, 0.5, 0.45]] == [3, 0, 2, 2])
+
+
+def test_timeline_many_stops():
+    stops = "\n".join("{}% {{ strobe: {}; }}".format(i, i % 2) for i in range(0, 101, 2))
+    timeline = Timeline(parse_stylesheet("@keyframes blink {" + stops + "}").keyframes['blink'])
+    for i in range(1000):
+        t = i / 1000
+        # same as a linear scan of the frames
+        assert(timeline.find(t) == len([s for s in timeline.selectors if s <= t]) - 1)
@@ -3,6 +3,7 @@ from lib.css import \
     Color, \
     parse_strobe, \
     Strobe, \
+    Rotation, \
     parse_keyframe_frames
 
 from .fixtures import *  # NOQA
@@ -59,3 +60,14 @@ def test_parse_animation(animation_delay):
     assert(anim.delay == 2)
     assert(anim.iteration == "infinite")
     assert(anim.direction == "normal")
+
+
+def test_interpolate_into():
+    dest = Color(0, 0, 0)
+    assert(Color(0, 100, 200).interpolate_into(Color(100, 0, 200, 50, 0), 0.5, dest) is dest)
+    assert(dest == Color(50, 50, 200, 25, 127))
+    assert(Color(0, 0, 0, name='red').interpolate_into(Color(1, 2, 3), 0.5, dest) == Color(0, 0, 0, name='red'))
+    assert(Strobe(10).interpolate(Strobe(20), 0.5) == Strobe(15))
+    assert(Rotation(speed=0).interpolate(Rotation(position=10), 0.5) == Rotation(speed=0))
+    assert(Strobe(0) != Rotation(speed=0))
+    assert(not hasattr(dest, '__dict__'))
@@ -0,0 +1,99 @@
+import os
+import pty
+import termios
+import time
+import tty
+
+import pytest
+
+from lib.dmxserial import END, SEND_CHANNELS, SEND_DMX, START, DmxSerial
+
+
+def open_device():
+    master, slave = pty.openpty()
+    tty.setraw(slave, termios.TCSANOW)
+    return master, slave, os.ttyname(slave)
+
+
+@pytest.fixture
+def device():
+    """ A fake serial device, return the path of the port and a function reading what was written to it """
+    master, slave, path = open_device()
+
+    def read(size):
+        data = b''
+        deadline = time.monotonic() + 1
+        while len(data) < size and time.monotonic() < deadline:
+            data += os.read(master, size - len(data))
+        return data
+
+    yield path, read
+    os.close(slave)
+    os.close(master)
+
+
+def parse_packets(data):
+    packets = []
+    while data:
+        assert(data[0] == START)
+        length = data[2] | data[3] << 8
+        assert(data[4 + length] == END)
+        packets.append((data[1], data[4:4 + length]))
+        data = data[5 + length:]
+    return packets
+
+
+def test_serial_sends_full_then_changed_channels(device):
+    path, read = device
+    output = DmxSerial(path, delta=True)
+    frame = bytearray(512)
+    frame[0] = 1
+    frame[511] = 2
+    output(1, frame)
+    # other universes are ignored
+    output(2, frame)
+    [(label, data)] = parse_packets(read(518))
+    assert(label == SEND_DMX and data == bytes([0]) + frame)
+    frame[10:13] = bytes([3, 4, 5])
+    output(1, frame)
+    assert(parse_packets(read(10)) == [(SEND_CHANNELS, bytes([10, 0, 3, 4, 5]))])
+    # an unchanged frame is a keep-alive, sent in full
+    output(1, frame)
+    assert(parse_packets(read(518)) == [(SEND_DMX, bytes([0]) + frame)])
+    output.close()
+
+
+def test_serial_sends_in_chunks_without_delta(device):
+    path, read = device
+    # full frames by default, as expected by an Enttec DMX USB Pro
+    output = DmxSerial(path, chunk_size=64)
+    frame = bytearray(range(256)) * 2
+    output(1, frame)
+    frame[0] = 255
+    output(1, frame)
+    assert(parse_packets(read(2 * 518)) == [(SEND_DMX, bytes([0]) + bytes(range(256)) * 2),
+                                            (SEND_DMX, bytes([0]) + frame)])
+    output.close()
+
+
+def test_serial_reconnects(tmpdir):
+    output = DmxSerial(str(tmpdir.join("missing")), retry=0)
+    frame = bytearray(512)
+    output(1, frame)
+    assert(output.serial is None)
+    master, slave, output.port = open_device()
+    output(1, frame)
+    assert(output.serial is not None)
+    assert(os.read(master, 518)[:2] == bytes([START, SEND_DMX]))
+    # the device goes away, the next frame fails and the port is opened again
+    os.close(slave)
+    os.close(master)
+    frame[0] = 1
+    output(1, frame)
+    assert(output.serial is None)
+    master, slave, output.port = open_device()
+    output(1, frame)
+    assert(os.read(master, 518)[:2] == bytes([START, SEND_DMX]))
+    output.close()
+    os.close(slave)
+    os.close(master)
@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from lib.hardware import DeviceLibrary, load_devices
+from lib.plan import compile_plan
+
+from .fixtures import *  # NOQA
+
+
+def write_device(directory, filename, name, chan=1):
+    directory.join(filename).write(json.dumps({"name": name, "mapping": {"strobe": {"speed": {"chan": chan}}}}))
+
+
+def test_default_library():
+    devices = load_devices()
+    assert('chronosIII' in devices)
+    assert(devices['led-ws2811']['color']['red']['chan'] == 1)
+    assert('root' not in devices)
+
+
+def test_library_loads_only_used_devices(tmpdir):
+    write_device(tmpdir, "good.json", "good")
+    tmpdir.join("broken.json").write(json.dumps({"name": "broken", "mapping": {"strobe": {"speed": {}}}}))
+    devices = DeviceLibrary([str(tmpdir)])
+    assert(devices['good']['strobe']['speed']['chan'] == 1)
+    with pytest.raises(ValidationError):
+        devices['broken']
+
+
+def test_library_paths_precedence(tmpdir):
+    first, second = tmpdir.mkdir("first"), tmpdir.mkdir("second")
+    write_device(first, "spot.json", "spot", chan=1)
+    write_device(second, "spot.json", "spot", chan=2)
+    write_device(second, "bar.json", "bar", chan=3)
+    devices = DeviceLibrary([str(first), str(second)])
+    assert(devices['spot']['strobe']['speed']['chan'] == 1)
+    assert(devices['bar']['strobe']['speed']['chan'] == 3)
+    assert(sorted(devices) == ['bar', 'spot'])
+
+
+def test_library_finds_devices_by_declared_name(tmpdir):
+    write_device(tmpdir, "some-file.json", "spot")
+    devices = DeviceLibrary([str(tmpdir)])
+    assert('spot' in devices)
+    assert(devices['spot']['strobe']['speed']['chan'] == 1)
+    assert('some-file' not in devices)
+
+
+def test_plan_uses_devices_by_declared_name(tmpdir):
+    library = tmpdir.mkdir("devices")
+    with open(os.path.join("devices", "led-ws2811.json")) as f:
+        library.join("ws2811-strip.json").write(f.read())
+    tree, css = load_project(tmpdir, "<root><led-ws2811 id='a' address='1' /></root>",
+                             "#a { color: rgb(1, 2, 3); }")
+    plan = compile_plan(tree, DeviceLibrary([str(library)]), css.keyframes, vectorize=False)
+    assert(plan.compute(0)[1][:3] == bytes([1, 2, 3]))
+
+
+def test_library_validates_only_used_devices(tmpdir, monkeypatch):
+    tree, css = load_project(tmpdir, """
+        <root>
+            <node id="strip">
+                <led-ws2811 id="a" address="1" />
+            </node>
+        </root>
+    """, "#a { color: rgb(1, 2, 3); }")
+    devices = load_devices()
+    loaded, opened = [], []
+    load, json_load = DeviceLibrary.load, json.load
+
+    def counting_load(self, file):
+        loaded.append(os.path.basename(file))
+        return load(self, file)
+
+    def counting_json_load(f):
+        opened.append(os.path.basename(f.name))
+        return json_load(f)
+
+    monkeypatch.setattr(DeviceLibrary, 'load', counting_load)
+    monkeypatch.setattr(json, 'load', counting_json_load)
+    compile_plan(tree, devices, css.keyframes, vectorize=False)
+    # <root> and <node> scan the names of the library once, only the used profile is validated
+    assert(loaded == ['led-ws2811.json'])
+    assert(len(opened) == len(devices.files()) + 1)
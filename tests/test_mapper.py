@@ -0,0 +1,48 @@
+import pytest
+
+from lib.core import COMPUTING_FUNCTIONS
+from lib.css import Auto, Color, Pulse, Rotation, Strobe
+from lib.mapper import compile_device
+
+from .fixtures import *  # NOQA
+
+VALUES = {
+    'color': [Color(0, 0, 0), Color(255, 128, 3, 40, 17), Color(12, 34, 56, alpha=0), Color(0, 0, 0, name='red')],
+    'strobe': [Strobe(0), Strobe(1), Strobe(128), Strobe(255)],
+    'pulse': [Pulse('normal', 0), Pulse('alternate', 200)],
+    'auto': [Auto('sound', 0), Auto('snap-3', 90), Auto('show', 255)],
+    'rotation': [Rotation(position=0), Rotation(position=100), Rotation(speed=255)],
+}
+
+
+def compute_or_error(function, *args):
+    try:
+        return function(*args)
+    except KeyError:
+        return KeyError
+
+
+@pytest.mark.parametrize("name", ["chronosIII", "fg-led-dd-rgbw", "led-ws2811", "mini-dekker"])
+def test_mapper_matches_compute_dmx(devices, name):
+    device = devices[name]
+    mappers = compile_device(device)
+    assert(sorted(mappers) == sorted(p for p in device if p in COMPUTING_FUNCTIONS))
+    for prop, mapper in mappers.items():
+        for value in VALUES[prop]:
+            expected = compute_or_error(COMPUTING_FUNCTIONS[prop], value, device, 10)
+            assert(compute_or_error(mapper.pairs, value, 10) == expected)
+            if expected is KeyError:
+                continue
+            frame, reference = bytearray(512), bytearray(512)
+            mapper.write(value, frame, 9)
+            for address, dmx_value in expected:
+                reference[address - 1] = dmx_value
+            assert(frame == reference)
+
+
+def test_mapper_ignores_channels_outside_of_universe(devices):
+    mapper = compile_device(devices['chronosIII'])['color']
+    frame = bytearray(512)
+    mapper.write(Color(1, 2, 3, alpha=4), frame, 509)
+    assert(frame[509:] == bytes([1, 2, 3]))
+    assert(frame[:509] == bytes(509))
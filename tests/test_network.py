@@ -0,0 +1,56 @@
+import socket
+import struct
+
+import pytest
+
+from lib.network import SACN, ArtNet, sacn_multicast
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(1)
+    yield sock
+    sock.close()
+
+
+def test_artnet_sends_universes(listener):
+    sender = ArtNet('127.0.0.1', port=listener.getsockname()[1])
+    frame = bytearray(range(256)) * 2
+    sender(3, frame)
+    frame[0] = 42
+    sender(3, frame)
+    sequences = []
+    for _ in range(2):
+        packet = listener.recv(1024)
+        assert(len(packet) == 530 and packet[:8] == b'Art-Net\0')
+        opcode, = struct.unpack_from('<H', packet, 8)
+        version, sequence = struct.unpack_from('>HB', packet, 10)
+        universe, = struct.unpack_from('<H', packet, 14)
+        length, = struct.unpack_from('>H', packet, 16)
+        assert((opcode, version, universe, length) == (0x5000, 14, 3, 512))
+        sequences.append(sequence)
+    assert(sequences == [1, 2])
+    assert(packet[18:] == frame)
+    sender.close()
+
+
+def test_sacn_sends_universes(listener):
+    port = listener.getsockname()[1]
+    sender = SACN(destinations={7: '127.0.0.1'}, port=port)
+    assert(sender.destination(7) == '127.0.0.1')
+    assert(sender.destination(258) == sacn_multicast(258) == '239.255.1.2')
+    frame = bytearray(512)
+    frame[511] = 255
+    sender(7, frame)
+    packet = listener.recv(1024)
+    assert(len(packet) == 638)
+    assert(packet[4:16] == b'ASC-E1.17\0\0\0')
+    assert(packet[22:38] == sender.cid)
+    assert(packet[44:51] == b'css2dmx' and packet[108] == 100)
+    assert(packet[111] == 1)
+    assert(struct.unpack_from('>H', packet, 113) == (7,))
+    assert(struct.unpack_from('>H', packet, 123) == (513,))
+    assert(packet[125] == 0 and packet[126:] == frame)
+    sender.close()
@@ -0,0 +1,219 @@
+from threading import Event
+import json
+import logging
+import time
+
+import pytest
+
+from lib.backend import Backend
+from lib.dmxserial import DmxSerial
+from lib.network import ArtNet
+from lib.output import Mailbox, Output, load_outputs, send_changed, start_outputs
+
+
+def test_send_changed():
+    sent, calls = {}, []
+    frames = {1: bytearray(512), 2: bytearray(512)}
+    send_changed(frames, sent, lambda u, f: calls.append((u, bytes(f))))
+    assert([u for u, _ in calls] == [1, 2])
+    send_changed(frames, sent, lambda u, f: calls.append((u, bytes(f))))
+    assert(len(calls) == 2)
+    frames[2][0] = 255
+    assert(send_changed(frames, sent, lambda u, f: calls.append((u, bytes(f)))) == [2])
+    assert(len(calls) == 3 and calls[-1][0] == 2 and calls[-1][1][0] == 255)
+    assert(send_changed(frames, sent, lambda u, f: calls.append((u, bytes(f))), stale={1}) == [1])
+
+
+def test_mailbox_keeps_latest_frames():
+    mailbox = Mailbox()
+    frame = bytearray(512)
+    for i in range(5):
+        frame[0] = i
+        mailbox.put({1: frame})
+    frames = {}
+    assert(mailbox.get(frames, 0) == 5)
+    assert(frames[1][0] == 4)
+    assert(mailbox.get(frames, 5, timeout=0.01) == 5)
+    # the same frames again are not a new version
+    assert(mailbox.put({1: frame}) == 0)
+    assert(mailbox.get(frames, 5, timeout=0.01) == 5)
+    mailbox.close()
+    assert(mailbox.get(frames, 5) is None)
+
+
+def test_slow_output_drops_stale_frames():
+    mailbox = Mailbox()
+    received = []
+    release = Event()
+
+    def send(universe, frame):
+        received.append(frame[0])
+        release.wait()
+
+    output = Output('slow', mailbox, send, keepalive=0)
+    output.start()
+    frame = bytearray(512)
+    frame[0] = 1
+    mailbox.put({1: frame})
+    while not received:
+        time.sleep(0.001)
+    # the output is busy, only the last of these frames must be sent
+    for i in range(2, 10):
+        frame[0] = i
+        mailbox.put({1: frame})
+    release.set()
+    deadline = time.monotonic() + 1
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    mailbox.close()
+    output.join(1)
+    assert(received == [1, 9])
+    assert(output.dropped == 7)
+
+
+def test_output_keepalive_resends_unchanged_universes():
+    mailbox = Mailbox()
+    received = []
+    output = Output('keepalive', mailbox, lambda universe, frame: received.append(universe), keepalive=0.02)
+    output.start()
+    mailbox.put({1: bytearray(512)})
+    deadline = time.monotonic() + 1
+    while len(received) < 3 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    mailbox.close()
+    output.join(1)
+    assert(len(received) >= 3 and set(received) == {1})
+
+
+class Recorder(Backend):
+    """ Record the first channel of each frame written, fail to connect the first `failures` times """
+    retry = 0
+
+    def __init__(self, failures=0, delay=0):
+        super().__init__()
+        self.failures = failures
+        self.delay = delay
+        self.received = []
+        self.flushed = 0
+
+    def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise Exception("not ready")
+
+    def write(self, universe, frame):
+        time.sleep(self.delay)
+        self.received.append(frame[0])
+
+    def flush(self):
+        self.flushed += 1
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 1
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_output_rate_limit():
+    mailbox = Mailbox()
+    fast, slow = Recorder(), Recorder()
+    outputs = start_outputs(mailbox, [('fast', fast), ('slow', slow, {'fps': 20})], keepalive=0)
+    frame = bytearray(512)
+    for i in range(1, 31):
+        frame[0] = i
+        mailbox.put({1: frame})
+        time.sleep(0.01)
+    wait_for(lambda: fast.received[-1:] == [30] and slow.received[-1:] == [30])
+    mailbox.close()
+    for output in outputs:
+        output.join(1)
+    assert(len(fast.received) > 20 and fast.flushed == len(fast.received))
+    # 20 frames per second during 0.3s, and the last frame
+    assert(len(slow.received) <= 9 and slow.received[-1] == 30)
+    assert(outputs[1].health()['dropped'] > 0 and not slow.connected)
+
+
+def test_blocking_output_gets_every_frame():
+    mailbox = Mailbox()
+    backend = Recorder(delay=0.005)
+    [output] = start_outputs(mailbox, [('block', backend, {'policy': 'block'})], keepalive=0)
+    frame = bytearray(512)
+    waited = 0
+    for i in range(1, 11):
+        frame[0] = i
+        waited += mailbox.put({1: frame})
+    wait_for(lambda: len(backend.received) == 10)
+    mailbox.close()
+    output.join(1)
+    assert(backend.received == list(range(1, 11)))
+    assert(output.dropped == 0 and waited > 0)
+
+
+def test_output_resends_after_reconnecting():
+    mailbox = Mailbox()
+    backend = Recorder(failures=1)
+    output = Output('retry', mailbox, backend, keepalive=0, universes=[1])
+    output.start()
+    frame = bytearray(512)
+    frame[0] = 1
+    mailbox.put({1: frame, 2: frame})
+    wait_for(lambda: backend.errors == 1)
+    frame[0] = 2
+    mailbox.put({1: frame, 2: frame})
+    wait_for(lambda: backend.received[-1:] == [2])
+    mailbox.close()
+    output.join(1)
+    # the first frame is retried once the backend connects, universe 2 is not sent
+    assert(backend.received in ([1, 2], [2]))
+    assert(output.count == len(backend.received))
+    assert(output.frames.keys() == {1})
+
+
+def test_load_outputs(tmpdir):
+    tmpdir.join("outputs.json").write(json.dumps({"outputs": [
+        {"backend": "serial", "port": "/dev/ttyUSB1", "baudrate": 250000, "fps": 25},
+        {"name": "nodes", "backend": "artnet", "host": "10.0.0.255", "fps": 44, "universes": [1, 2],
+         "policy": "latest"},
+    ]}))
+    [(name, serial, options), (name2, artnet, options2)] = load_outputs(str(tmpdir.join("outputs.json")))
+    assert(name == 'serial' and isinstance(serial, DmxSerial) and serial.baudrate == 250000)
+    assert(options == {'fps': 25})
+    assert(name2 == 'nodes' and isinstance(artnet, ArtNet) and artnet.host == '10.0.0.255')
+    assert(options2 == {'fps': 44, 'universes': [1, 2], 'policy': 'latest'})
+    for outputs in [[{"backend": "smoke"}], [{"backend": "ola", "port": 3}],
+                    [{"backend": "ola"}, {"backend": "ola"}], [{"backend": "ola", "fps": 0}]]:
+        tmpdir.join("outputs.json").write(json.dumps({"outputs": outputs}))
+        with pytest.raises(Exception):
+            load_outputs(str(tmpdir.join("outputs.json")))
+
+
+def test_output_retries_failed_universes():
+    mailbox = Mailbox()
+    received = []
+    failures = [Exception("busy")]
+
+    def send(universe, frame):
+        if failures:
+            raise failures.pop()
+        received.append(universe)
+
+    output = Output('flaky', mailbox, send, keepalive=0)
+    output.backend.retry = 0.01
+    output.start()
+    # the frame never changes, it is sent again after the failure anyway
+    mailbox.put({1: bytearray(512)})
+    wait_for(lambda: received)
+    mailbox.close()
+    output.join(1)
+    assert(received == [1] and output.backend.errors == 1)
+
+
+def test_backend_logs_only_the_first_failure(caplog):
+    backend = Recorder(failures=3)
+    with caplog.at_level(logging.DEBUG, logger='lib.backend'):
+        while not backend.open():
+            pass
+    levels = [record.levelno for record in caplog.records]
+    assert(levels == [logging.WARNING, logging.DEBUG, logging.DEBUG, logging.INFO])
+    assert(backend.health() == {'connected': True, 'errors': 3})
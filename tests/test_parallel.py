@@ -0,0 +1,38 @@
+from lib.parallel import ParallelPlan, partition
+from lib.plan import compile_plan
+
+from .fixtures import *  # NOQA
+
+
+def write_universes(tmpdir, universes, count):
+    tree = ["<root>"]
+    style = []
+    for u in range(1, universes + 1):
+        tree.append("<node universe='{}'>".format(u))
+        for i in range(count * u):
+            tree.append("<led-ws2811 class='u{}' address='{}' />".format(u, 1 + 3 * i))
+        tree.append("</node>")
+        style.append(".u{} {{ animation: fade {}s linear {}s infinite alternate; }}".format(u, u, u / 10))
+    tree.append("<chronosIII address='100' universe='2' />")
+    tree.append("</root>")
+    style.append("chronosIII { color: rgb(1, 2, 3); strobe: 0.5; }")
+    style.append("@keyframes fade { 0% { color: rgb(0, 0, 0); } 100% { color: rgbw(255, 128, 64, 32); } }")
+    return load_project(tmpdir, "\n".join(tree), "\n".join(style))
+
+
+def test_partition_balances_universes(devices, tmpdir):
+    tree, css = write_universes(tmpdir, 4, 10)
+    plan = compile_plan(tree, devices, css.keyframes, vectorize=False)
+    assert(partition(plan, 2) == [[1, 4], [2, 3]])
+    assert(partition(plan, 8) == [[4], [3], [2], [1]])
+
+
+def test_parallel_plan_matches_plan(devices, tmpdir):
+    tree, css = write_universes(tmpdir, 5, 20)
+    plan = compile_plan(tree, devices, css.keyframes)
+    with ParallelPlan(plan, 3) as parallel:
+        assert(len(parallel.processes) == 3)
+        for i in range(50):
+            t = i * 0.13
+            assert(parallel.compute(t) == plan.compute(t))
+    assert(all(not process.is_alive() for process in parallel.processes))
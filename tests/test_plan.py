@@ -0,0 +1,112 @@
+import pytest
+
+from lib.core import compute_dmx
+from lib.plan import compile_plan
+
+from .fixtures import *  # NOQA
+
+EXAMPLES = ["chronosIII", "chronosIII-full", "fg-led-dd-rgbw", "home", "mini-dekker"]
+
+
+def frames_from_state(state):
+    frames = {}
+    for universe, values in state.items():
+        frame = frames[universe] = bytearray(512)
+        for address, value in values:
+            frame[address - 1] = value
+    return frames
+
+
+@pytest.mark.parametrize("example", EXAMPLES)
+def test_plan_matches_compute_dmx(devices, example):
+    tree, css = load_example(example)
+    plan = compile_plan(tree, devices, css.keyframes, vectorize=False)
+    for i in range(200):
+        t = 0.011 + i * 0.073
+        assert(plan.compute(t) == frames_from_state(compute_dmx(tree, devices, css.keyframes, t)))
+
+
+def test_plan_groups_shared_animations(devices):
+    tree, css = load_example("home")
+    plan = compile_plan(tree, devices, css.keyframes, vectorize=False)
+    assert(len(plan.animations) == 1)
+    assert(len(plan.nodes) == 16)
+
+
+def write_chase(tmpdir, count):
+    tree = ["<root>", "<node id='wall'>"]
+    style = []
+    for i in range(count):
+        tree.append("<led-ws2811 id='p{}' address='{}' />".format(i, 1 + 3 * i))
+        style.append("#p{} {{ animation: chase 2s ease-in-out {}ms {} {}; }}".format(
+            i, 37 * i, 'infinite' if i % 3 else 2, ['normal', 'reverse', 'alternate', 'alternate-reverse'][i % 4]))
+    tree.extend(["</node>", "<chronosIII id='spot' address='200' />", "</root>"])
+    style.append("#spot { animation: chase 3s linear 0s infinite alternate; }")
+    style.append("""
+        @keyframes chase {
+            0% { color: rgb(0, 0, 0); strobe: 0; }
+            30% { color: rgba(255, 128, 0, 0.5); }
+            100% { color: rgbw(10, 20, 30, 40); strobe: 1; }
+        }
+    """)
+    return load_project(tmpdir, "\n".join(tree), "\n".join(style))
+
+
+def test_vectorized_plan_matches_python(devices, tmpdir):
+    pytest.importorskip("numpy")
+    tree, css = write_chase(tmpdir, 60)
+    python_plan = compile_plan(tree, devices, css.keyframes, vectorize=False)
+    numpy_plan = compile_plan(tree, devices, css.keyframes, vectorize=True, min_batch_size=1)
+    assert(len(numpy_plan.nodes) == 0)
+    assert(len(numpy_plan.batches) == 2)
+    for i in range(300):
+        t = 0.011 + i * 0.031
+        expected = python_plan.compute(t)
+        frame = numpy_plan.compute(t)
+        assert(frame.keys() == expected.keys())
+        assert(all(abs(a - b) <= 1 for a, b in zip(frame[1], expected[1])))
+
+
+def test_plan_universes(devices, tmpdir):
+    tree, css = load_project(tmpdir, """
+        <root>
+            <chronosIII id="a" address="10" />
+            <node universe="3">
+                <chronosIII id="b" address="10" />
+                <led-ws2811 id="c" universe="2" address="510" />
+            </node>
+        </root>
+    """, """
+        #a { color: rgb(1, 2, 3); }
+        #b { color: rgb(4, 5, 6); }
+        #c { color: rgb(7, 8, 9); }
+    """)
+    frames = compile_plan(tree, devices, css.keyframes).compute(0)
+    assert(sorted(frames.keys()) == [1, 2, 3])
+    assert(frames[1][9:12] == bytes([1, 2, 3]))
+    assert(frames[3][9:12] == bytes([4, 5, 6]))
+    assert(frames[2][509:512] == bytes([7, 8, 9]))
+
+
+def test_plan_skips_settled_universes(devices, tmpdir):
+    tree, css = load_project(tmpdir, """
+        <root>
+            <chronosIII id="a" address="10" />
+            <chronosIII id="b" universe="2" address="10" />
+        </root>
+    """, """
+        #a { animation: fade 1s linear 500ms 2; }
+        #b { animation: fade 1s linear 0s infinite; }
+        @keyframes fade {
+            0% { color: rgb(0, 0, 0); }
+            100% { color: rgb(255, 255, 255); }
+        }
+    """)
+    plan = compile_plan(tree, devices, css.keyframes, vectorize=False)
+    assert(plan.ends[1] == 2.5)
+    assert(plan.ends[2] == float('inf'))
+    for t in [0, 1, 2, 2.6, 3, 10]:
+        assert(plan.compute(t) == frames_from_state(compute_dmx(tree, devices, css.keyframes, t)))
+    assert(1 in plan._settled and plan._live == {1: False, 2: True})
+    # going back in time computes the universe again
+    assert(plan.compute(1.2) == frames_from_state(compute_dmx(tree, devices, css.keyframes, 1.2)))
@@ -0,0 +1,62 @@
+import os
+import random
+
+import pytest
+
+from lib.plan import compile_plan
+from lib.recording import Player, Recording, diff_runs, render
+
+from .fixtures import *  # NOQA
+
+
+def test_diff_runs():
+    previous = bytearray(100)
+    current = bytearray(100)
+    assert(diff_runs(previous, current) == [])
+    current[3] = current[5] = current[40] = current[99] = 1
+    assert(diff_runs(previous, current) == [[3, 6], [40, 41], [99, 100]])
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_recording_replays_plan(devices, tmpdir, compress):
+    tree, css = load_example("chronosIII-full")
+    plan = compile_plan(tree, devices, css.keyframes)
+    filename = str(tmpdir.join("show.dmx"))
+    assert(render(plan, filename, 10, 25, start=1, keyframe_interval=20, compress=compress) == 250)
+    expected = [{u: bytes(f) for u, f in plan.compute(1 + i / 25).items()} for i in range(250)]
+    with Recording(filename) as recording:
+        assert(len(recording) == 250)
+        assert(recording.universes == sorted(plan.frames))
+        assert(recording.compressed == compress)
+        player = Player(recording)
+        for i in range(250):
+            assert(player.compute(i / 25) == expected[i])
+        order = list(range(250))
+        random.Random(0).shuffle(order)
+        for i in order:
+            assert(player.compute(i / 25) == expected[i])
+        assert(player.compute(100) == expected[-1])
+    # far smaller than the raw frames
+    assert(os.path.getsize(filename) < 250 * 512 / 4)
+
+
+def test_recording_rejects_other_files(tmpdir):
+    filename = tmpdir.join("tree.xml")
+    filename.write("<root></root>" * 10)
+    with pytest.raises(Exception):
+        Recording(str(filename))
+
+
+def test_player_cues(devices, tmpdir):
+    tree, css = load_example("chronosIII-full")
+    plan = compile_plan(tree, devices, css.keyframes)
+    filename = str(tmpdir.join("show.dmx"))
+    render(plan, filename, 4, 10, keyframe_interval=7)
+    expected = [{u: bytes(f) for u, f in plan.compute(i / 10).items()} for i in range(40)]
+    with Recording(filename) as recording:
+        player = Player(recording, start=1.5, speed=2, loop=True)
+        for i in range(100):
+            assert(player.compute(i / 10) == expected[(15 + 2 * i) % 40])
+        player = Player(recording, start=2, speed=-1)
+        for i in range(30):
+            assert(player.compute(i / 10) == expected[max(20 - i, 0)])
@@ -0,0 +1,36 @@
+import os
+
+from lib.reload import ShowWatcher
+
+from .fixtures import *  # NOQA
+
+
+def touch(path, content):
+    # make sure the modification is seen even on filesystems with a coarse mtime
+    stat = os.stat(str(path))
+    path.write(content)
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_watcher_reloads_changed_files(devices, tmpdir):
+    tree, css = load_project(tmpdir, '<root><chronosIII id="spot" /></root>', '#spot { color: rgb(1, 2, 3); }')
+    tree_file, css_file = tmpdir.join("tree.xml"), tmpdir.join("style.css")
+    watcher = ShowWatcher(str(tree_file), str(css_file), devices, tree, css)
+    assert(not watcher.check())
+    assert(watcher.take() is None)
+
+    touch(css_file, '#spot { color: rgb(4, 5, 6); }')
+    assert(watcher.check())
+    frames = watcher.take().compute(0)
+    assert(frames[1][:3] == bytes([4, 5, 6]))
+    assert(watcher.take() is None)
+
+    touch(tree_file, '<root><chronosIII id="spot" address="10" /></root>')
+    assert(watcher.check())
+    frames = watcher.take().compute(0)
+    assert(frames[1][9:12] == bytes([4, 5, 6]))
+
+    # a broken file keeps the current show
+    touch(css_file, '#spot { color: rgb(4, 5); }')
+    assert(not watcher.check())
+    assert(watcher.take() is None)
@@ -0,0 +1,55 @@
+from itertools import islice
+
+import pytest
+
+from lib.scheduler import FrameScheduler
+
+
+class FakeClock:
+    """ Clock advancing by `step` ns on every read, sleep jumps forward """
+    def __init__(self, step=1000):
+        self.now = 0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += int(seconds * 1e9)
+
+
+def test_scheduler_ticks_do_not_drift():
+    clock = FakeClock()
+    scheduler = FrameScheduler(50, clock=clock, sleep=clock.sleep)
+    ticks = list(islice(scheduler, 100))
+    assert(ticks == pytest.approx([i * 0.02 for i in range(100)]))
+    assert(scheduler.stats.overruns == 0)
+    assert(scheduler.stats.max < 10000)
+    assert(scheduler.stats.fps == pytest.approx(50, rel=1e-3))
+
+
+def test_scheduler_skips_missed_ticks():
+    clock = FakeClock()
+    scheduler = FrameScheduler(50, clock=clock, sleep=clock.sleep)
+    ticks = []
+    for t in islice(scheduler, 5):
+        ticks.append(t)
+        if len(ticks) == 2:
+            # a frame taking 3.5 frames
+            clock.now += 70000000
+    assert(ticks == pytest.approx([0, 0.02, 0.08, 0.1, 0.12]))
+    assert(scheduler.stats.overruns == 1)
+    assert(scheduler.stats.skipped == 2)
+
+
+def test_scheduler_catches_up():
+    clock = FakeClock()
+    scheduler = FrameScheduler(50, clock=clock, sleep=clock.sleep, policy='catchup')
+    ticks = []
+    for t in islice(scheduler, 5):
+        ticks.append(t)
+        if len(ticks) == 2:
+            clock.now += 70000000
+    assert(ticks == pytest.approx([0, 0.02, 0.04, 0.06, 0.08]))
+    assert(scheduler.stats.skipped == 0)
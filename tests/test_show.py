@@ -0,0 +1,55 @@
+import os
+import pickle
+
+from lib.css import Selector
+from lib.show import load_show, show_key
+
+
+def example(name):
+    return os.path.join("examples", name, "tree.xml"), os.path.join("examples", name, "style.css")
+
+
+def test_load_show_from_cache(tmpdir):
+    tree_file, css_file = example("home")
+    cache_dir = str(tmpdir.join("cache"))
+    built = load_show(tree_file, css_file, cache_dir)
+    assert(len(os.listdir(cache_dir)) == 1)
+    cached = load_show(tree_file, css_file, cache_dir)
+    assert(cached.plan is not built.plan)
+    for i in range(50):
+        t = 0.013 + i * 0.17
+        assert(cached.plan.compute(t) == built.plan.compute(t))
+    pixels = list(cached.tree.select(Selector('tag', 'led-ws2811')))
+    assert(len(pixels) == 16)
+    cached.tree.remove(pixels[0].parent)
+    assert(list(cached.tree.select(Selector('tag', 'led-ws2811'))) == [])
+
+
+def test_show_key_depends_on_inputs(tmpdir):
+    tree_file, css_file = example("home")
+    key = show_key(tree_file, css_file)
+    assert(show_key(tree_file, css_file) == key)
+    copy = tmpdir.join("style.css")
+    copy.write(open(css_file).read() + "\n#imac { strobe: 0.1; }")
+    assert(show_key(tree_file, str(copy)) != key)
+
+
+def test_corrupted_cache_is_rebuilt(tmpdir):
+    tree_file, css_file = example("chronosIII")
+    cache_dir = tmpdir.join("cache")
+    cache_dir.ensure(dir=True)
+    cache_dir.join(show_key(tree_file, css_file) + ".pickle").write("garbage")
+    show = load_show(tree_file, css_file, str(cache_dir))
+    assert(show.plan.compute(0.5)[1][0] == 255)
+
+
+def test_stale_cache_is_rebuilt(tmpdir):
+    tree_file, css_file = example("chronosIII")
+    cache_dir = tmpdir.join("cache")
+    cache_dir.ensure(dir=True)
+    cache = cache_dir.join(show_key(tree_file, css_file) + ".pickle")
+    # unpickling calls int('x') and raises a ValueError
+    for content in [b"cbuiltins\nint\n(Vx\ntR.", pickle.dumps([1, 2])]:
+        cache.write_binary(content)
+        show = load_show(tree_file, css_file, str(cache_dir))
+        assert(show.plan.compute(0.5)[1][0] == 255)
@@ -0,0 +1,44 @@
+import json
+from urllib.request import urlopen
+
+from lib.stats import Histogram, Registry, serve
+
+
+def test_histogram():
+    histogram = Histogram()
+    assert(histogram.percentile(99) == 0)
+    for duration in [1000] * 98 + [5000, 3000000]:
+        histogram.record(duration)
+    assert(histogram.count == 100)
+    assert(histogram.mean == (98 * 1000 + 5000 + 3000000) / 100)
+    assert(histogram.percentile(50) == 1024)
+    assert(histogram.percentile(99) == 8192)
+    assert(histogram.percentile(100) == 3000000)
+    assert(histogram.to_dict()['buckets_ns'] == {'1024': 98, '8192': 1, '4194304': 1})
+
+
+def test_registry():
+    registry = Registry()
+    registry.record('compute', 2000000)
+    registry.count('frames')
+    registry.count('frames', 2)
+    registry.gauge('answer', lambda: 42)
+    snapshot = registry.snapshot()
+    assert(snapshot['stages']['compute']['count'] == 1)
+    assert(snapshot['counters'] == {'frames': 3})
+    assert(snapshot['gauges'] == {'answer': 42})
+    assert(registry.summary() == "compute avg 2.000ms p99 2.000ms max 2.000ms | frames 3")
+    registry.reset()
+    assert(registry.summary() == "frames 3")
+
+
+def test_serve():
+    registry = Registry()
+    registry.record('compute', 1000)
+    server = serve(0, stats=registry)
+    try:
+        with urlopen("http://127.0.0.1:{}/stats".format(server.server_address[1])) as response:
+            assert(json.load(response)['stages']['compute']['count'] == 1)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,66 @@
+from lib.plan import compile_plan
+from lib.style import StyleMap
+
+from .fixtures import *  # NOQA
+
+TREE = """
+<root>
+    <node id="wall" class="pixels">
+        <led-ws2811 id="p1" class="even" address="1" />
+        <led-ws2811 id="p2" class="odd" address="4" />
+        <led-ws2811 id="p3" class="even" address="7" />
+    </node>
+    <chronosIII id="spot" class="odd" address="20" />
+</root>
+"""
+
+STYLES = [
+    """
+    .pixels { color: rgb(10, 10, 10); }
+    .even { color: rgb(255, 0, 0); }
+    #spot { strobe: 0.5; animation: fade 2s linear 0s infinite; }
+    @keyframes fade { from { color: #000; } to { color: #fff; } }
+    """,
+    """
+    .pixels { color: rgb(10, 10, 10); }
+    .even { color: rgb(0, 255, 0); }
+    #spot { strobe: 0.5; animation: fade 2s linear 0s infinite; }
+    @keyframes fade { from { color: #000; } to { color: #fff; } }
+    """,
+    """
+    .odd { animation: fade 2s linear 0s infinite; }
+    .pixels { color: rgb(10, 10, 10); }
+    .even { color: rgb(0, 255, 0); }
+    #spot { strobe: 0.5; animation: fade 2s linear 0s infinite; }
+    @keyframes fade { from { color: #000; } 50% { color: #f00; } to { color: #fff; } }
+    """,
+    """
+    .odd { animation: fade 2s linear 0s infinite; }
+    #spot { strobe: 0.5; animation: fade 2s linear 0s infinite; }
+    @keyframes fade { from { color: #000; } 50% { color: #f00; } to { color: #fff; } }
+    """,
+]
+
+
+def test_incremental_restyle_matches_full_restyle(devices, tmpdir):
+    tree, css = load_project(tmpdir, TREE, STYLES[0], styled=False)
+    styles = StyleMap(tree, css)
+    plan = compile_plan(tree, devices, css.keyframes)
+    for style in STYLES[1:]:
+        expected_tree, new_css = load_project(tmpdir, TREE, style)
+        changed = styles.update(new_css)
+        assert(len(changed) < len(list(tree.walk())))
+        for node, expected in zip(tree.walk(), expected_tree.walk()):
+            assert(node.style == expected.style)
+            assert(list(node.style) == list(expected.style))
+        plan = compile_plan(tree, devices, new_css.keyframes, previous=plan, changed=changed)
+        expected_plan = compile_plan(expected_tree, devices, new_css.keyframes)
+        for i in range(20):
+            assert(plan.compute(0.013 + i * 0.1) == expected_plan.compute(0.013 + i * 0.1))
+
+
+def test_unchanged_stylesheet_affects_nothing(tmpdir):
+    tree, css = load_project(tmpdir, TREE, STYLES[0], styled=False)
+    styles = StyleMap(tree, css)
+    _, same = load_project(tmpdir, TREE, STYLES[0], styled=False)
+    assert(styles.update(same) == [])
@@ -0,0 +1,53 @@
+from lib.css import Selector
+from lib.tree import Node
+
+from .fixtures import *  # NOQA
+
+
+def walk_select(tree, selector):
+    for node in tree.walk():
+        if selector.type == 'id' and selector.value == node.id:
+            yield node
+        elif selector.type == 'class' and selector.value in node.klass:
+            yield node
+        elif selector.type == 'tag' and selector.value == node.tag:
+            yield node
+
+
+def make_node(tag, id='', klass='', children=None):
+    return Node(tag, address=1, id=id, klass=klass, children=children or [])
+
+
+def test_select_matches_walk(tmpdir):
+    tree, _ = load_project(tmpdir, """
+        <root>
+            <group id="left" class="side wall">
+                <led-ws2811 class="pixel wall" />
+                <led-ws2811 class="pixel" />
+            </group>
+            <group id="right" class="side">
+                <led-ws2811 id="last" class="pixel pixel" />
+            </group>
+        </root>
+    """)
+    left = next(tree.select(Selector('id', 'left')))
+    selectors = [Selector('id', 'left'), Selector('id', 'last'), Selector('class', 'pixel'),
+                 Selector('class', 'wall'), Selector('tag', 'led-ws2811'), Selector('tag', 'group'),
+                 Selector('tag', 'unknown')]
+    for selector in selectors:
+        assert(list(tree.select(selector)) == list(walk_select(tree, selector)))
+        assert(list(left.select(selector)) == list(walk_select(left, selector)))
+
+
+def test_index_follows_tree_changes():
+    pixel = make_node('led-ws2811', klass='pixel')
+    group = make_node('group', id='wall', children=[make_node('led-ws2811', klass='pixel')])
+    tree = make_node('root', children=[group])
+    assert(len(list(tree.select(Selector('class', 'pixel')))) == 1)
+    group.append(pixel)
+    assert(list(tree.select(Selector('class', 'pixel')))[-1] is pixel)
+    assert(len(list(group.select(Selector('class', 'pixel')))) == 2)
+    tree.remove(group)
+    assert(list(tree.select(Selector('class', 'pixel'))) == [])
+    assert(list(tree.select(Selector('id', 'wall'))) == [])
+    assert(list(group.select(Selector('class', 'pixel')))[-1] is pixel)
@@ -0,0 +1,29 @@
+import pytest
+
+from lib.utils import compute_easing, easing_table
+
+
+def test_compute_easing_bounds():
+    assert(compute_easing((0.25, 0.1), (0.25, 1), 0) == 0)
+    assert(compute_easing((0.25, 0.1), (0.25, 1), 1) == pytest.approx(1))
+    assert(compute_easing((0.25, 0.1), (0.25, 1), -0.5) == 0)
+    assert(compute_easing((0.25, 0.1), (0.25, 1), 1.5) == pytest.approx(1))
+
+
+def test_compute_easing_linear():
+    for i in range(101):
+        assert(compute_easing((0, 0), (1, 1), i / 100) == pytest.approx(i / 100))
+
+
+def test_compute_easing_ease_in_out_is_symmetric():
+    for i in range(101):
+        x = i / 100
+        y = compute_easing((0.42, 0), (0.58, 1), x)
+        assert(y == pytest.approx(1 - compute_easing((0.42, 0), (0.58, 1), 1 - x), abs=1e-6))
+
+
+def test_easing_table_resolution():
+    assert(len(easing_table((0.25, 0.1), (0.25, 1), 16)) == 17)
+    coarse = compute_easing((0.25, 0.1), (0.25, 1), 0.3, resolution=16)
+    fine = compute_easing((0.25, 0.1), (0.25, 1), 0.3, resolution=4096)
+    assert(coarse == pytest.approx(fine, abs=1e-2))